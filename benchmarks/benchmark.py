@@ -0,0 +1,33 @@
+"""Helpers for timing Scheme programs in the interpreter."""
+import os
+import sys
+import time
+
+REPOSITORY_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPOSITORY_ROOT, 'interpreter'))
+
+from evaluator import eval_program, load_built_ins, load_standard_library
+from environment import Environment
+
+
+def fresh_environment(engine='analyser', pure_scheme=False):
+    # the standard library path is relative to the repository root
+    os.chdir(REPOSITORY_ROOT)
+
+    environment = Environment()
+    environment = load_built_ins(environment)
+    environment = load_standard_library(environment, engine, pure_scheme)
+
+    return environment
+
+
+def best_time(function, repeat=3):
+    """Call function `repeat` times, returning the fastest time in seconds."""
+    times = []
+
+    for i in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+
+    return min(times)
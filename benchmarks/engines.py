@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""Compare the closure analyser with the bytecode VM."""
+from benchmark import eval_program, fresh_environment, best_time
+from fib import FIB
+
+LIST_RECURSION = """(define (build n)
+                      (if (= n 0)
+                          '()
+                          (cons n (build (- n 1)))))
+
+                    (define (sum items)
+                      (if (null? items)
+                          0
+                          (+ (car items) (sum (cdr items)))))
+
+                    (define (repeat n)
+                      (if (= n 0)
+                          0
+                          (begin
+                            (sum (build 100))
+                            (repeat (- n 1)))))"""
+
+PROGRAMS = [(FIB, "(fib 20)"),
+            (LIST_RECURSION, "(repeat 100)")]
+
+
+if __name__ == '__main__':
+    for definitions, program in PROGRAMS:
+        for engine in ['analyser', 'vm']:
+            environment = fresh_environment(engine)
+            eval_program(definitions, environment, engine)
+
+            seconds = best_time(lambda: eval_program(program, environment, engine))
+            print("%s with %s: %.3f seconds" % (program, engine, seconds))
@@ -0,0 +1,16 @@
+#!/usr/bin/env python3
+"""Naive fib, which spends almost all its time calling functions."""
+from benchmark import eval_program, fresh_environment, best_time
+
+FIB = """(define (fib n)
+           (if (< n 2)
+               n
+               (+ (fib (- n 1)) (fib (- n 2)))))"""
+
+
+if __name__ == '__main__':
+    environment = fresh_environment()
+    eval_program(FIB, environment)
+
+    seconds = best_time(lambda: eval_program("(fib 20)", environment))
+    print("(fib 20): %.3f seconds" % seconds)
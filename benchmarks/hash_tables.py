@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""Time looking up keys in an association list and in a hash table."""
+from benchmark import eval_program, fresh_environment, best_time
+
+SETUP = """(define (assoc key alist)
+             (cond ((null? alist) #f)
+                   ((eqv? key (car (car alist))) (car alist))
+                   (else (assoc key (cdr alist)))))
+
+           (define keys (do ((i 0 (+ i 1))
+                             (result '() (cons i result)))
+                            ((= i 500) result)))
+
+           (define alist (map (lambda (key) (cons key #t)) keys))
+
+           (define table (make-hash-table eqv?))
+           (for-each (lambda (key) (hash-table-set! table key #t)) keys)"""
+
+ALIST_LOOKUPS = "(for-each (lambda (key) (assoc key alist)) keys)"
+
+TABLE_LOOKUPS = "(for-each (lambda (key) (hash-table-ref table key)) keys)"
+
+
+if __name__ == '__main__':
+    _, environment = eval_program(SETUP, fresh_environment())
+
+    seconds = best_time(lambda: eval_program(ALIST_LOOKUPS, environment))
+    print("Looking up 500 keys in an association list: %.4f seconds" % seconds)
+
+    seconds = best_time(lambda: eval_program(TABLE_LOOKUPS, environment))
+    print("Looking up 500 keys in a hash table: %.4f seconds" % seconds)
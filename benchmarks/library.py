@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""Compare the built-in list functions with the Scheme versions in
+library.scm. We use the VM, since the Scheme versions recurse too deeply
+for the analyser.
+
+"""
+from benchmark import eval_program, fresh_environment, best_time
+
+BUILD_LIST = """(define (build-list n)
+                  (do ((i n (- i 1))
+                       (result '() (cons i result)))
+                      ((= i 0) result)))
+                (define items (build-list 10000))"""
+
+PROGRAMS = ["(length items)",
+            "(map (lambda (x) x) items)",
+            "(list->vector items)"]
+
+
+if __name__ == '__main__':
+    for program in PROGRAMS:
+        for pure_scheme in [True, False]:
+            environment = fresh_environment('vm', pure_scheme)
+            eval_program(BUILD_LIST, environment, 'vm')
+
+            seconds = best_time(lambda: eval_program(program, environment, 'vm'))
+
+            if pure_scheme:
+                print("%s in Scheme: %.4f seconds" % (program, seconds))
+            else:
+                print("%s built-in: %.4f seconds" % (program, seconds))
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""Time calls with many arguments, and printing long lists."""
+from benchmark import eval_program, fresh_environment, best_time
+from data_types import get_external_representation
+
+ARGUMENTS = " ".join(str(i) for i in range(500))
+
+# each program is evaluated from scratch, so this includes analysing
+# the call as well as making it
+CALLS = ["(+ %s)" % ARGUMENTS,
+         "(list %s)" % ARGUMENTS,
+         "(rest-arguments %s)" % ARGUMENTS]
+
+REST_ARGUMENTS = "(define (rest-arguments . arguments) arguments)"
+
+BUILD_LIST = """(define (build-list n)
+                  (do ((i n (- i 1))
+                       (result '() (cons i result)))
+                      ((= i 0) result)))
+                (build-list 100000)"""
+
+NESTED_LIST = "(map (lambda (x) (list x x)) (build-list 10000))"
+
+
+if __name__ == '__main__':
+    environment = fresh_environment()
+    eval_program(REST_ARGUMENTS, environment)
+
+    for program in CALLS:
+        seconds = best_time(lambda: eval_program(program, environment))
+        print("Calling %s with 500 arguments: %.4f seconds" % (program.split()[0][1:], seconds))
+
+    items, environment = eval_program(BUILD_LIST, environment)
+
+    seconds = best_time(lambda: get_external_representation(items))
+    print("Printing a list of 100000 integers: %.4f seconds" % seconds)
+
+    items, environment = eval_program(NESTED_LIST, environment)
+
+    seconds = best_time(lambda: get_external_representation(items))
+    print("Printing a list of 10000 two element lists: %.4f seconds" % seconds)
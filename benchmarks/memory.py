@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""Measure how much memory our data types use."""
+import tracemalloc
+
+import benchmark
+from data_types import Cons, Nil, Integer, Vector, NumericVector
+
+COUNT = 100000
+
+
+def bytes_per_object(make_object):
+    """Return the average memory allocated by each call to make_object."""
+    # allocate the list first, so we only measure the objects
+    objects = [None] * COUNT
+
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+
+    for i in range(COUNT):
+        objects[i] = make_object(i)
+
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return (after - before) / COUNT
+
+
+# share the head and the tail, so we only measure the cells
+HEAD = Integer(1)
+TAIL = Nil()
+
+def make_cons_cell(i):
+    return Cons(HEAD, TAIL)
+
+
+def make_integer(i):
+    # use large numbers, so Python's small int cache doesn't affect the result
+    return Integer(i + 1000000)
+
+
+VECTOR_LENGTH = 100000
+
+
+def bytes_per_element(make_vector):
+    """Return the memory allocated by make_vector, per element."""
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+
+    vector = make_vector()
+
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return (after - before) / len(vector)
+
+
+def make_vector():
+    return Vector.from_list([i + 0.5 for i in range(VECTOR_LENGTH)])
+
+
+def make_f64vector():
+    return NumericVector('f64', (i + 0.5 for i in range(VECTOR_LENGTH)))
+
+
+if __name__ == '__main__':
+    print("Cons cell: %.1f bytes" % bytes_per_object(make_cons_cell))
+    print("Integer: %.1f bytes" % bytes_per_object(make_integer))
+    print("Vector of floats: %.1f bytes per element" % bytes_per_element(make_vector))
+    print("f64vector: %.1f bytes per element" % bytes_per_element(make_f64vector))
@@ -0,0 +1,179 @@
+"""The PLY lexer and LALR grammar that interpreter/scheme_parser.py
+replaced, kept so benchmarks/reader.py can compare the two readers.
+PLY writes its parse tables to parsetab.py in this directory.
+
+"""
+import ply.lex
+import ply.yacc
+
+from data_types import (Cons, NIL, Symbol, Integer, FloatingPoint, Boolean,
+                        Character, String)
+from errors import SchemeSyntaxError
+
+tokens = ('LPAREN', 'RPAREN', 'SYMBOL', 'INTEGER', 'BOOLEAN', 'FLOATING_POINT',
+          'CHARACTER', 'STRING', 'QUOTESUGAR', 'QUASIQUOTESUGAR',
+          'UNQUOTESUGAR', 'UNQUOTESPLICINGSUGAR')
+
+t_LPAREN = r'\('
+t_RPAREN = r'\)'
+t_SYMBOL = r'[a-zA-Z!$%&*+./:<=>?"@^_~-][0-9a-zA-Z!$%&*+./:<=>?"@^_~-]*'
+t_QUOTESUGAR = r"'"
+t_QUASIQUOTESUGAR = r"`"
+t_UNQUOTESUGAR = r","
+t_UNQUOTESPLICINGSUGAR = r",@"
+
+def t_STRING(t):
+    r'"(\\"|\\n|[a-zA-Z*+/!?=<>. -])*"'
+    # strip leading and trailing doublequote from input
+    t.value = t.value[1:-1]
+
+    # replace escaped characters with their Python representation
+    t.value = t.value.replace('\\"', '"')
+    t.value = t.value.replace('\\n', '\n')
+    return t
+
+def t_FLOATING_POINT(t):
+    r"-?([0-9]*\.[0-9]+)|([0-9]+\.[0-9]*)"
+    t.value = float(t.value)
+    return t
+
+def t_INTEGER(t):
+    r'-?[0-9]+'
+    t.value = int(t.value)
+    return t
+
+def t_BOOLEAN(t):
+    r'\#t|\#f'
+    if t.value == "#t":
+        t.value = True
+    else:
+        t.value = False
+
+    return t
+
+def t_CHARACTER(t):
+    r'\#\\(space|newline|.)'
+    # throw away leading #\
+    t.value = t.value[2:]
+
+    if t.value == 'space':
+        t.value = ' '
+    elif t.value == 'newline':
+        t.value = '\n'
+
+    return t
+
+t_ignore_COMMENT = r";[^\n]*"
+
+# whitespace
+t_ignore = ' \t\n'
+
+def t_error(t):
+    raise SchemeSyntaxError('Could not lex the remainder of input: "%s"' % t.value)
+
+
+"""Grammar for our minimal scheme:
+
+# a program is a series of s-expressions
+program : sexpression program
+        |
+
+# an s-expression is a list or an atom
+sexpression : atom
+            | list
+
+# unlike a normal list, using ' only permits one argument
+list : ( listarguments )
+     | QUOTESUGAR sexpression
+     | QUASIQUOTESUGAR sexpression
+     | UNQUOTESUGAR sexpression
+     | UNQUOTESPLICINGSUGAR sexpression
+
+listarguments : sexpression listarguments
+              |
+
+atom : SYMBOL | NUMBER | BOOLEAN | CHARACTER | STRING
+
+"""
+
+# now, parse an expression and build a parse tree:
+
+def p_program(p):
+    "program : sexpression program"
+    p[0] = Cons(p[1], p[2])
+
+def p_program_empty(p):
+    "program :"
+    p[0] = NIL
+
+def p_sexpression_atom(p):
+    "sexpression : atom"
+    p[0] = p[1]
+
+def p_sexpression_list(p):
+    "sexpression : list"
+    p[0] = p[1]
+
+def p_list(p):
+    "list : LPAREN listarguments RPAREN"
+    p[0] = p[2]
+
+def p_list_quotesugar(p):
+    "list : QUOTESUGAR sexpression"
+    # convert 'foo to (quote foo)
+    p[0] = Cons(Symbol("quote"), Cons(p[2]))
+
+def p_list_quasiquotesugar(p):
+    "list : QUASIQUOTESUGAR sexpression"
+    # convert `foo to (quasiquote foo)
+    p[0] = Cons(Symbol("quasiquote"), Cons(p[2]))
+
+def p_list_unquotesugar(p):
+    "list : UNQUOTESUGAR sexpression"
+    # convert ,foo to (unquote foo)
+    p[0] = Cons(Symbol("unquote"), Cons(p[2]))
+
+def p_list_unquotesplicingsugar(p):
+    "list : UNQUOTESPLICINGSUGAR sexpression"
+    # convert ,foo to (unquote foo)
+    p[0] = Cons(Symbol("unquote-splicing"), Cons(p[2]))
+
+def p_listarguments_one(p):
+    "listarguments : sexpression listarguments"
+    # a list is therefore a nested tuple:
+    p[0] = Cons(p[1], p[2])
+
+def p_listargument_empty(p):
+    "listarguments :"
+    p[0] = NIL
+
+def p_atom_symbol(p):
+    "atom : SYMBOL"
+    p[0] = Symbol(p[1])
+
+def p_atom_number(p):
+    "atom : INTEGER"
+    p[0] = Integer(p[1])
+
+def p_atom_floating_point(p):
+    "atom : FLOATING_POINT"
+    p[0] = FloatingPoint(p[1])
+
+def p_atom_boolean(p):
+    "atom : BOOLEAN"
+    p[0] = Boolean(p[1])
+
+def p_atom_character(p):
+    "atom : CHARACTER"
+    p[0] = Character(p[1])
+
+def p_atom_string(p):
+    "atom : STRING"
+    p[0] = String(p[1])
+
+def p_error(p):
+    raise SchemeSyntaxError("Parse error.")
+
+
+lexer = ply.lex.lex()
+parser = ply.yacc.yacc(debug=False)
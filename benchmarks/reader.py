@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""Compare the reader in scheme_parser.py with the PLY reader it
+replaced, on a large generated program.
+
+"""
+import os
+import subprocess
+import sys
+
+from benchmark import REPOSITORY_ROOT, best_time
+from data_types import is_equal
+from scheme_parser import parse
+
+# a function definition, some quoted data and a string, so we see
+# every kind of token
+FORM = """(define (function-%(index)d x)
+  ; add up some numbers
+  (let ((total (+ x %(index)d 1.5 -2)))
+    (if (> total 0) `(positive ,total) '(negative #t #\\a "some text"))))
+"""
+
+FORM_COUNT = 5000
+
+IMPORT_TIME = """import sys, time
+sys.path[:0] = %(path)r
+import data_types, errors
+start = time.perf_counter()
+import %(module)s
+print(time.perf_counter() - start)"""
+
+
+def import_time(module):
+    """Return the time taken to import module in a new Python
+    process. We import it once first, so PLY can write its tables.
+
+    """
+    code = IMPORT_TIME % {'path': [os.path.join(REPOSITORY_ROOT, 'interpreter'),
+                                   os.path.dirname(os.path.abspath(__file__))],
+                          'module': module}
+    times = []
+
+    for i in range(4):
+        output = subprocess.check_output([sys.executable, '-c', code])
+        times.append(float(output))
+
+    return min(times[1:])
+
+
+if __name__ == '__main__':
+    program = "".join(FORM % {'index': index} for index in range(FORM_COUNT))
+    megabytes = len(program) / 1e6
+
+    try:
+        from ply_reader import parser as ply_parser
+    except ImportError:
+        ply_parser = None
+        print("PLY isn't installed, so we can't compare with the PLY reader.")
+
+    seconds = best_time(lambda: parse(program))
+    print("Reading %.2f MB: %.2f MB/s" % (megabytes, megabytes / seconds))
+    print("Importing the reader: %.4f seconds" % import_time('scheme_parser'))
+
+    if ply_parser:
+        seconds = best_time(lambda: ply_parser.parse(program))
+        print("Reading %.2f MB with PLY: %.2f MB/s" % (megabytes, megabytes / seconds))
+        print("Importing the PLY reader: %.4f seconds" % import_time('ply_reader'))
+
+        if not is_equal(parse(program), ply_parser.parse(program)):
+            print("The readers gave different results!")
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""Compare reading a whole program before evaluating it (as we used
+to) with reading and evaluating one s-expression at a time, on a large
+generated program.
+
+"""
+import os
+import tempfile
+import time
+import tracemalloc
+
+from benchmark import fresh_environment
+from evaluator import eval_file, eval_s_expressions
+from scheme_parser import parse
+
+FORM = "(if (> %(index)d 0) '(%(index)d \"some text\" #\\a 2.5) #f)\n"
+
+FORM_COUNT = 20000
+
+
+def measure(evaluate):
+    """Return the seconds evaluate() took and the peak memory it
+    allocated in megabytes.
+
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+
+    evaluate()
+
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return seconds, peak / 1e6
+
+
+if __name__ == '__main__':
+    environment = fresh_environment()
+
+    with tempfile.NamedTemporaryFile('w', suffix='.scm', delete=False) as program_file:
+        for index in range(FORM_COUNT):
+            program_file.write(FORM % {'index': index})
+
+    path = program_file.name
+    megabytes = os.path.getsize(path) / 1e6
+
+    def read_then_evaluate():
+        with open(path) as program_file:
+            s_expressions = parse(program_file.read())
+
+        eval_s_expressions(s_expressions, environment, 'analyser')
+
+    def stream():
+        with open(path) as program_file:
+            eval_file(program_file, environment)
+
+    seconds, peak = measure(read_then_evaluate)
+    print("Reading %.1f MB, then evaluating: %.2f seconds, %.2f MB peak"
+          % (megabytes, seconds, peak))
+
+    seconds, peak = measure(stream)
+    print("Reading and evaluating %.1f MB as we go: %.2f seconds, %.2f MB peak"
+          % (megabytes, seconds, peak))
+
+    os.remove(path)
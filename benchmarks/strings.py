@@ -0,0 +1,22 @@
+#!/usr/bin/env python3
+"""Time building long strings a character at a time."""
+from benchmark import eval_program, fresh_environment, best_time
+
+FILL_STRING = """(define s (make-string 20000))
+                 (do ((i 0 (+ i 1)))
+                     ((= i 20000) s)
+                   (string-set! s i #\\a))"""
+
+APPEND_STRING = """(define s (make-string 0))
+                   (do ((i 0 (+ i 1)))
+                       ((= i 20000) s)
+                     (string-append! s "ab"))"""
+
+
+if __name__ == '__main__':
+    # each run defines s, so it needs a fresh environment
+    seconds = best_time(lambda: eval_program(FILL_STRING, fresh_environment()))
+    print("Setting 20000 characters with string-set!: %.4f seconds" % seconds)
+
+    seconds = best_time(lambda: eval_program(APPEND_STRING, fresh_environment()))
+    print("Appending 20000 strings with string-append!: %.4f seconds" % seconds)
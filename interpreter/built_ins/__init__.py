@@ -9,5 +9,7 @@ from . import equivalence
 from . import chars
 from . import strings
 from . import vectors
+from . import numeric_vectors
+from . import hash_tables
 from . import io
 from . import control
@@ -1,7 +1,7 @@
 from .base import define_built_in
 from utils import check_argument_number
 
-from data_types import (Boolean, Character)
+from data_types import (Character, TRUE, FALSE)
 from errors import SchemeTypeError
 
 
@@ -10,9 +10,9 @@ def is_char(arguments):
     check_argument_number('char?', arguments, 1, 1)
 
     if isinstance(arguments[0], Character):
-        return Boolean(True)
+        return TRUE
 
-    return Boolean(False)
+    return FALSE
 
 
 @define_built_in('char=?')
@@ -25,9 +25,9 @@ def char_equal(arguments):
                                                 arguments[1].__class__))
 
     if arguments[0].value == arguments[1].value:
-        return Boolean(True)
+        return TRUE
 
-    return Boolean(False)
+    return FALSE
 
 
 @define_built_in('char<?')
@@ -40,8 +40,8 @@ def char_less_than(arguments):
                                                 arguments[1].__class__))
 
     if arguments[0].value < arguments[1].value:
-        return Boolean(True)
+        return TRUE
 
-    return Boolean(False)
+    return FALSE
 
 
@@ -1,6 +1,6 @@
 from .base import define_built_in
 from utils import check_argument_number
-from data_types import Boolean
+from data_types import (TRUE, FALSE)
 
 
 @define_built_in('procedure?')
@@ -8,6 +8,6 @@ def is_procedure(arguments):
     check_argument_number('procedure?', arguments, 1, 1)
 
     if callable(arguments[0]):
-        return Boolean(True)
+        return TRUE
 
-    return Boolean(False)
+    return FALSE
@@ -1,7 +1,7 @@
 from .base import define_built_in
 from utils import check_argument_number
 
-from data_types import (Cons, Atom, Boolean, Number)
+from data_types import (Boolean, Number, TRUE, FALSE, is_eqv, is_equal)
 from errors import SchemeTypeError
 
 
@@ -10,16 +10,14 @@ from errors import SchemeTypeError
 def test_equivalence(arguments):
     check_argument_number('eqv?', arguments, 2, 2)
 
-    if isinstance(arguments[0], Atom):
-        # __eq__ is defined on Atom
-        return Boolean(arguments[0] == arguments[1])
-    if isinstance(arguments[0], Cons):
-        # __eq__ on Cons is deep equality
-        return Boolean(arguments[0] is arguments[1])
-    else:
-        # __eq__ is defined on Nil
-        # todo: test vectors
-        return Boolean(arguments[0] == arguments[1])
+    return Boolean(is_eqv(arguments[0], arguments[1]))
+
+
+@define_built_in('equal?')
+def test_equal(arguments):
+    check_argument_number('equal?', arguments, 2, 2)
+
+    return Boolean(is_equal(arguments[0], arguments[1]))
 
 
 @define_built_in('=')
@@ -31,8 +29,8 @@ def equality(arguments):
                                   "you gave me %s." % argument.__class__)
 
         if argument != arguments[0]:
-            return Boolean(False)
+            return FALSE
 
-    return Boolean(True)
+    return TRUE
 
 
@@ -0,0 +1,297 @@
+"""SRFI 69 hash tables. A table compares keys with eq?, eqv?, equal?
+or string=?, and each of these has a key function that turns a Scheme
+value into a Python dict key (see HashTable). Lookups are then
+constant time, rather than walking an association list.
+
+"""
+from .base import define_built_in
+from utils import check_argument_number
+from data_types import (HashTable, Cons, Vector, NumericVector, String, Character,
+                        Function, Number, NIL, TRUE, FALSE, is_equal,
+                        get_external_representation)
+from errors import SchemeTypeError, InvalidArgument
+
+# evaluator imports the built-ins, so we can only use it once it has
+# finished loading
+import evaluator
+
+
+def eqv_key(value):
+    """Return a dict key that is the same for all eqv? values (see
+    is_eqv).
+
+    """
+    if isinstance(value, Number):
+        # 2 and 2.0 aren't eqv?, but Python considers them equal
+        return (type(value), value)
+
+    if isinstance(value, Character):
+        # characters outside Latin-1 aren't cached
+        return (Character, value.value)
+
+    # the table keeps a reference to the key, so its id can't be reused
+    return id(value)
+
+
+def string_key(value):
+    if not isinstance(value, String):
+        raise SchemeTypeError("A string=? hash table only takes string keys, "
+                              "not a %s." % value.__class__)
+
+    return value.value
+
+
+# hashing stops after this many parts of a value, so large and
+# circular keys still take constant time to hash
+HASH_BOUND = 64
+
+
+def equal_hash(value):
+    """Return a hash of value that is the same for all equal? values.
+    We don't recurse, and we only look at the first HASH_BOUND parts.
+
+    """
+    result = 0
+    stack = [value]
+    parts_seen = 0
+
+    while stack and parts_seen < HASH_BOUND:
+        value = stack.pop()
+        parts_seen += 1
+
+        if isinstance(value, Cons):
+            part_hash = 1
+            stack.append(value.tail)
+            stack.append(value.head)
+        elif isinstance(value, (Vector, NumericVector)):
+            part_hash = len(value)
+            stack.extend(reversed(value.value[:HASH_BOUND]))
+        elif isinstance(value, (String, Character)):
+            part_hash = hash(value.value)
+        elif isinstance(value, Number):
+            part_hash = hash(value)
+        else:
+            # symbols, booleans, () and functions are only equal? to
+            # themselves
+            part_hash = id(value)
+
+        result = hash((result, part_hash))
+
+    return result
+
+
+class EqualKey(object):
+    """A dict key that compares Scheme values with equal?."""
+    __slots__ = ('value', 'hash')
+
+    def __init__(self, value):
+        self.value = value
+        self.hash = equal_hash(value)
+
+    def __hash__(self):
+        return self.hash
+
+    def __eq__(self, other):
+        return is_equal(self.value, other.value)
+
+
+key_functions = {'eq?': eqv_key, 'eqv?': eqv_key, 'equal?': EqualKey,
+                 'string=?': string_key}
+
+
+@define_built_in('make-hash-table')
+def make_hash_table(arguments):
+    # we know how to hash keys for every equivalence we support, so
+    # we accept a hash function but don't need it
+    check_argument_number('make-hash-table', arguments, 0, 2)
+
+    if not arguments:
+        return HashTable('equal?', EqualKey)
+
+    equivalence = arguments[0]
+
+    if not isinstance(equivalence, Function) or \
+            getattr(equivalence, 'name', None) not in key_functions:
+        raise InvalidArgument("make-hash-table can only compare keys with eq?, "
+                              "eqv?, equal? or string=?.")
+
+    return HashTable(equivalence.name, key_functions[equivalence.name])
+
+
+def check_hash_table(function_name, table):
+    if not isinstance(table, HashTable):
+        raise SchemeTypeError("%s takes a hash table as its first argument, "
+                              "not a %s." % (function_name, table.__class__))
+
+
+def check_function(function_name, function):
+    if not isinstance(function, Function):
+        raise SchemeTypeError("%s takes a function, not a %s."
+                              % (function_name, function.__class__))
+
+
+def missing_key(function_name, key):
+    return InvalidArgument("%s: the hash table has no key %s."
+                           % (function_name, get_external_representation(key)))
+
+
+@define_built_in('hash-table?')
+def is_hash_table(arguments):
+    check_argument_number('hash-table?', arguments, 1, 1)
+
+    if isinstance(arguments[0], HashTable):
+        return TRUE
+
+    return FALSE
+
+
+@define_built_in('hash-table-ref')
+def hash_table_ref(arguments):
+    check_argument_number('hash-table-ref', arguments, 2, 3)
+    check_hash_table('hash-table-ref', arguments[0])
+
+    table, key = arguments[:2]
+
+    if key in table:
+        return table[key]
+
+    # (hash-table-ref table key thunk) calls thunk if key is missing
+    if len(arguments) == 3:
+        check_function('hash-table-ref', arguments[2])
+        return evaluator.call_function(arguments[2], [])
+
+    raise missing_key('hash-table-ref', key)
+
+
+@define_built_in('hash-table-ref/default')
+def hash_table_ref_default(arguments):
+    check_argument_number('hash-table-ref/default', arguments, 3, 3)
+    check_hash_table('hash-table-ref/default', arguments[0])
+
+    table, key, default = arguments
+
+    if key in table:
+        return table[key]
+
+    return default
+
+
+@define_built_in('hash-table-set!')
+def hash_table_set(arguments):
+    check_argument_number('hash-table-set!', arguments, 3, 3)
+    check_hash_table('hash-table-set!', arguments[0])
+
+    table, key, value = arguments
+    table[key] = value
+
+    return NIL
+
+
+@define_built_in('hash-table-delete!')
+def hash_table_delete(arguments):
+    check_argument_number('hash-table-delete!', arguments, 2, 2)
+    check_hash_table('hash-table-delete!', arguments[0])
+
+    table, key = arguments
+    del table[key]
+
+    return NIL
+
+
+@define_built_in('hash-table-exists?')
+def hash_table_exists(arguments):
+    check_argument_number('hash-table-exists?', arguments, 2, 2)
+    check_hash_table('hash-table-exists?', arguments[0])
+
+    table, key = arguments
+
+    if key in table:
+        return TRUE
+
+    return FALSE
+
+
+@define_built_in('hash-table-update!')
+def hash_table_update(arguments):
+    check_argument_number('hash-table-update!', arguments, 3, 4)
+    check_hash_table('hash-table-update!', arguments[0])
+    check_function('hash-table-update!', arguments[2])
+
+    table, key, function = arguments[:3]
+
+    if key in table:
+        value = table[key]
+    elif len(arguments) == 4:
+        check_function('hash-table-update!', arguments[3])
+        value = evaluator.call_function(arguments[3], [])
+    else:
+        raise missing_key('hash-table-update!', key)
+
+    table[key] = evaluator.call_function(function, [value])
+
+    return NIL
+
+
+@define_built_in('hash-table-update!/default')
+def hash_table_update_default(arguments):
+    check_argument_number('hash-table-update!/default', arguments, 4, 4)
+    check_hash_table('hash-table-update!/default', arguments[0])
+    check_function('hash-table-update!/default', arguments[2])
+
+    table, key, function, default = arguments
+
+    if key in table:
+        value = table[key]
+    else:
+        value = default
+
+    table[key] = evaluator.call_function(function, [value])
+
+    return NIL
+
+
+@define_built_in('hash-table-size')
+def hash_table_size(arguments):
+    check_argument_number('hash-table-size', arguments, 1, 1)
+    check_hash_table('hash-table-size', arguments[0])
+
+    return len(arguments[0])
+
+
+@define_built_in('hash-table-walk')
+def hash_table_walk(arguments):
+    check_argument_number('hash-table-walk', arguments, 2, 2)
+    check_hash_table('hash-table-walk', arguments[0])
+    check_function('hash-table-walk', arguments[1])
+
+    table, function = arguments
+
+    # the function may change the table, so we walk over a copy
+    for key, value in list(table):
+        evaluator.call_function(function, [key, value])
+
+    return NIL
+
+
+@define_built_in('hash-table-keys')
+def hash_table_keys(arguments):
+    check_argument_number('hash-table-keys', arguments, 1, 1)
+    check_hash_table('hash-table-keys', arguments[0])
+
+    return Cons.from_list(key for key, value in arguments[0])
+
+
+@define_built_in('hash-table-values')
+def hash_table_values(arguments):
+    check_argument_number('hash-table-values', arguments, 1, 1)
+    check_hash_table('hash-table-values', arguments[0])
+
+    return Cons.from_list(value for key, value in arguments[0])
+
+
+@define_built_in('hash-table->alist')
+def hash_table_to_alist(arguments):
+    check_argument_number('hash-table->alist', arguments, 1, 1)
+    check_hash_table('hash-table->alist', arguments[0])
+
+    return Cons.from_list(Cons(key, value) for key, value in arguments[0])
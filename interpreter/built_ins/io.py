@@ -1,5 +1,6 @@
 from .base import define_built_in
 from utils import check_argument_number
+from data_types import Number
 
 
 @define_built_in('display')
@@ -8,6 +9,10 @@ def display(arguments):
 
     atom = arguments[0]
     # FIXME: should we check type? Is this funcction only for strings?
-    print(atom.value, end='')
+    if isinstance(atom, Number):
+        # numbers are plain Python ints and floats
+        print(atom, end='')
+    else:
+        print(atom.value, end='')
 
     return None
@@ -1,6 +1,11 @@
 from .base import define_built_in
 from utils import check_argument_number
-from data_types import (Cons, Nil, Boolean)
+from data_types import (Cons, Integer, Function, NIL, TRUE, FALSE)
+from errors import SchemeTypeError, CircularList
+
+# evaluator imports the built-ins, so we can only use it once it has
+# finished loading
+import evaluator
 
 
 @define_built_in('car')
@@ -30,7 +35,7 @@ def set_car(arguments):
     list_given = arguments[0]
     list_given.head = arguments[1]
 
-    return Nil()
+    return NIL
 
 
 @define_built_in('set-cdr!')
@@ -41,7 +46,7 @@ def set_cdr(arguments):
     list_given = arguments[0]
     list_given.tail = arguments[1]
 
-    return Nil()
+    return NIL
 
 
 @define_built_in('cons')
@@ -57,8 +62,102 @@ def pair(arguments):
     check_argument_number('pair?', arguments, 1, 1)
 
     if isinstance(arguments[0], Cons):
-        return Boolean(True)
+        return TRUE
+
+    return FALSE
+
+
+@define_built_in('null?')
+def is_null(arguments):
+    check_argument_number('null?', arguments, 1, 1)
+
+    # there is only one empty list
+    if arguments[0] is NIL:
+        return TRUE
+
+    return FALSE
+
+
+def list_elements(linked_list, function_name):
+    """Return the elements of a proper list as a Python list."""
+    if linked_list is NIL:
+        return []
+
+    if not isinstance(linked_list, Cons) or not linked_list.is_proper():
+        raise SchemeTypeError("%s takes a list, not a %s."
+                              % (function_name, linked_list.__class__))
+
+    return linked_list.to_list()
+
+
+@define_built_in('list?')
+def is_list(arguments):
+    check_argument_number('list?', arguments, 1, 1)
+
+    if arguments[0] is NIL:
+        return TRUE
+
+    if isinstance(arguments[0], Cons) and arguments[0].is_proper():
+        return TRUE
+
+    return FALSE
+
+
+@define_built_in('length')
+def length(arguments):
+    check_argument_number('length', arguments, 1, 1)
+
+    linked_list = arguments[0]
+
+    if linked_list is NIL:
+        return Integer(0)
+
+    if isinstance(linked_list, Cons):
+        # count the cells without copying the elements
+        try:
+            list_length, tail = linked_list.find_end()
+        except CircularList:
+            tail = None
+
+        if tail is NIL:
+            return Integer(list_length)
+
+    raise SchemeTypeError("length takes a list, not a %s." % linked_list.__class__)
+
+
+def argument_lists(function_name, arguments):
+    """Return the function and the elements of the lists passed to map
+    or for-each. R5RS requires the lists to have the same length, but
+    like other implementations we stop at the end of the shortest.
+
+    """
+    check_argument_number(function_name, arguments, 2)
+
+    function = arguments[0]
+
+    if not isinstance(function, Function):
+        raise SchemeTypeError("%s takes a function as its first argument, "
+                              "not a %s." % (function_name, function.__class__))
+
+    lists = [list_elements(linked_list, function_name)
+             for linked_list in arguments[1:]]
+
+    return function, zip(*lists)
+
+
+@define_built_in('map')
+def map_function(arguments):
+    function, argument_tuples = argument_lists('map', arguments)
+
+    return Cons.from_list(evaluator.call_function(function, list(function_arguments))
+                          for function_arguments in argument_tuples)
+
 
-    return Boolean(False)
+@define_built_in('for-each')
+def for_each(arguments):
+    function, argument_tuples = argument_lists('for-each', arguments)
 
+    for function_arguments in argument_tuples:
+        evaluator.call_function(function, list(function_arguments))
 
+    return NIL
@@ -1,9 +1,8 @@
 import math
-from copy import copy
 
 from .base import define_built_in
 from utils import check_argument_number
-from data_types import (Boolean, Number, Integer, FloatingPoint)
+from data_types import (Number, Integer, FloatingPoint, TRUE, FALSE)
 from errors import SchemeTypeError
 
 
@@ -15,9 +14,9 @@ def number(arguments):
     check_argument_number('number?', arguments, 1, 1)
 
     if isinstance(arguments[0], Number):
-        return Boolean(True)
+        return TRUE
 
-    return Boolean(False)
+    return FALSE
 
 
 @define_built_in('exact?')
@@ -25,9 +24,9 @@ def exact(arguments):
     check_argument_number('exact?', arguments, 1, 1)
 
     if isinstance(arguments[0], Integer):
-        return Boolean(True)
+        return TRUE
     elif isinstance(arguments[0], FloatingPoint):
-        return Boolean(False)
+        return FALSE
     else:
         raise SchemeTypeError("exact? only takes integers or floating point "
                               "numbers as arguments, you gave me ""%s." % \
@@ -38,9 +37,9 @@ def inexact(arguments):
     check_argument_number('inexact?', arguments, 1, 1)
 
     if isinstance(arguments[0], FloatingPoint):
-        return Boolean(True)
+        return TRUE
     elif isinstance(arguments[0], Integer):
-        return Boolean(False)
+        return FALSE
     else:
         raise SchemeTypeError("exact? only takes integers or floating point "
                               "numbers as arguments, you gave me ""%s." % \
@@ -48,13 +47,7 @@ def inexact(arguments):
 
 @define_built_in('+')
 def add(arguments):
-    if not arguments:
-        return Integer(0)
-
-    if isinstance(arguments[0], Integer):
-        total = Integer(0)
-    elif isinstance(arguments[0], FloatingPoint):
-        total = FloatingPoint(0.0)
+    total = 0
 
     for argument in arguments:
         if not isinstance(argument, Number):
@@ -62,10 +55,8 @@ def add(arguments):
                                   "you gave me %s." % argument.__class__)
 
         # adding a float to an integer gives us a float
-        if isinstance(total, Integer) and isinstance(argument, FloatingPoint):
-            total = FloatingPoint(float(total.value))
+        total += argument
 
-        total.value += argument.value
     return total
 
 
@@ -75,50 +66,39 @@ def subtract(arguments):
 
     if len(arguments) == 1:
         # we just negate a single argument
-        if isinstance(arguments[0], Integer):
-            return Integer(-1 * arguments[0].value)
-        elif isinstance(arguments[0], FloatingPoint):
-            return FloatingPoint(-1 * arguments[0].value)
+        if isinstance(arguments[0], Number):
+            return -arguments[0]
         else:
             raise SchemeTypeError("Subtraction is only defined for integers and "
                                   "floating point, you gave me %s." % arguments[0].__class__)
 
-    total = copy(arguments[0])
+    if not isinstance(arguments[0], Number):
+        raise SchemeTypeError("Subtraction is only defined for numbers, "
+                              "you gave me %s." % arguments[0].__class__)
+
+    total = arguments[0]
 
-    for argument in arguments.tail:
+    for argument in arguments[1:]:
         if not isinstance(argument, Number):
             raise SchemeTypeError("Subtraction is only defined for numbers, "
                                   "you gave me %s." % argument.__class__)
 
         # subtracting a float from an integer gives us a float
-        if isinstance(total, Integer) and isinstance(argument, FloatingPoint):
-            total = FloatingPoint(float(total.value))
-
-        total.value -= argument.value
+        total -= argument
 
     return total
 
 
 @define_built_in('*')
 def multiply(arguments):
-    if not arguments:
-        return Integer(1)
-
-    if isinstance(arguments[0], Integer):
-        product = Integer(1)
-
-    elif isinstance(arguments[0], FloatingPoint):
-        product = FloatingPoint(1.0)
+    product = 1
 
     for argument in arguments:
         if not isinstance(argument, Number):
             raise SchemeTypeError("Multiplication is only defined for numbers, "
                                   "you gave me %s." % argument.__class__)
 
-        if isinstance(product, Integer) and isinstance(argument, FloatingPoint):
-            product = FloatingPoint(float(product.value))
-
-        product.value *= argument.value
+        product *= argument
 
     return product
 
@@ -130,12 +110,12 @@ def divide(arguments):
     check_argument_number('/', arguments, 1)
 
     if len(arguments) == 1:
-        return FloatingPoint(1 / arguments[0].value)
+        return 1 / arguments[0]
     else:
-        result = FloatingPoint(arguments[0].value)
+        result = float(arguments[0])
 
-        for argument in arguments.tail:
-            result.value /= argument.value
+        for argument in arguments[1:]:
+            result /= argument
 
         return result
 
@@ -145,10 +125,10 @@ def less_than(arguments):
     check_argument_number('<', arguments, 2)
 
     for i in range(len(arguments) - 1):
-        if not arguments[i].value < arguments[i+1].value:
-            return Boolean(False)
+        if not arguments[i] < arguments[i+1]:
+            return FALSE
 
-    return Boolean(True)
+    return TRUE
 
 
 @define_built_in('<=')
@@ -156,10 +136,10 @@ def less_or_equal(arguments):
     check_argument_number('<=', arguments, 2)
 
     for i in range(len(arguments) - 1):
-        if not arguments[i].value <= arguments[i+1].value:
-            return Boolean(False)
+        if not arguments[i] <= arguments[i+1]:
+            return FALSE
 
-    return Boolean(True)
+    return TRUE
 
 
 @define_built_in('>')
@@ -167,10 +147,10 @@ def greater_than(arguments):
     check_argument_number('>', arguments, 2)
 
     for i in range(len(arguments) - 1):
-        if not arguments[i].value > arguments[i+1].value:
-            return Boolean(False)
+        if not arguments[i] > arguments[i+1]:
+            return FALSE
 
-    return Boolean(True)
+    return TRUE
 
 
 @define_built_in('>=')
@@ -178,10 +158,10 @@ def greater_or_equal(arguments):
     check_argument_number('>=', arguments, 2)
 
     for i in range(len(arguments) - 1):
-        if not arguments[i].value >= arguments[i+1].value:
-            return Boolean(False)
+        if not arguments[i] >= arguments[i+1]:
+            return FALSE
 
-    return Boolean(True)
+    return TRUE
 
 
 @define_built_in('quotient')
@@ -195,11 +175,10 @@ def quotient(arguments):
                                                   arguments[1].__class__))
 
     # Python's integer division floors, whereas Scheme rounds towards zero
-    x1 = arguments[0].value
-    x2 = arguments[1].value
-    result = math.trunc(x1 / x2)
+    x1 = arguments[0]
+    x2 = arguments[1]
 
-    return Integer(result)
+    return math.trunc(x1 / x2)
 
 
 @define_built_in('modulo')
@@ -211,7 +190,7 @@ def modulo(arguments):
                               "got %s and %s." % (arguments[0].__class__,
                                                   arguments[1].__class__))
 
-    return Integer(arguments[0].value % arguments[1].value)
+    return arguments[0] % arguments[1]
 
 
 @define_built_in('remainder')
@@ -224,11 +203,9 @@ def remainder(arguments):
                                                   arguments[1].__class__))
 
     # as with quotient, we can't use Python's integer division here because it floors rather than truncates
-    x1 = arguments[0].value
-    x2 = arguments[1].value
-    value = x1 - (math.trunc(x1 / x2) * x2)
-
-    return Integer(value)
+    x1 = arguments[0]
+    x2 = arguments[1]
+    return x1 - (math.trunc(x1 / x2) * x2)
 
 
 @define_built_in('exp')
@@ -239,8 +216,8 @@ def exp(arguments):
         raise SchemeTypeError("exp only takes integers or floats, "
                               "got %s" % arguments[0].__class__)
 
-    x1 = arguments[0].value
-    return FloatingPoint(math.exp(x1))
+    x1 = arguments[0]
+    return math.exp(x1)
 
 
 @define_built_in('log')
@@ -251,5 +228,5 @@ def log(arguments):
         raise SchemeTypeError("Log is only defined for numbers, "
                               "you gave me %s." % arguments[0].__class__)
 
-    x1 = arguments[0].value
-    return FloatingPoint(math.log(x1))
+    x1 = arguments[0]
+    return math.log(x1)
@@ -0,0 +1,156 @@
+"""SRFI 4 homogeneous numeric vectors. Every vector type has the same
+built-ins, so we define them for each tag in turn, e.g. make-s64vector,
+s64vector-ref and list->s64vector.
+
+"""
+from .base import define_built_in
+from utils import check_argument_number
+from data_types import (NumericVector, NUMERIC_VECTOR_TYPECODES, Vector, Cons,
+                        Integer, NIL, TRUE, FALSE)
+from errors import SchemeTypeError, InvalidArgument
+from .lists import list_elements
+
+
+def make_numeric_vector(function_name, tag, values):
+    """Build a <tag>vector holding values, raising a Scheme error if
+    they don't fit.
+
+    """
+    try:
+        return NumericVector(tag, values)
+    except TypeError:
+        raise SchemeTypeError("%s: a %svector can only hold %s."
+                              % (function_name, tag, describe_numbers(tag)))
+    except OverflowError:
+        raise InvalidArgument("%s: a number is out of range for a %svector."
+                              % (function_name, tag))
+
+
+def describe_numbers(tag):
+    if tag.startswith('f'):
+        return "numbers"
+
+    return "integers"
+
+
+def check_numeric_vector(function_name, tag, vector):
+    if not isinstance(vector, NumericVector) or vector.tag != tag:
+        raise SchemeTypeError("%s takes a %svector as its first argument, "
+                              "not a %s." % (function_name, tag, vector.__class__))
+
+
+def check_index(function_name, vector, index):
+    if not isinstance(index, Integer):
+        raise SchemeTypeError("%s takes an integer index, not a %s."
+                              % (function_name, index.__class__))
+
+    # Python would let us index from the end with a negative index
+    if not 0 <= index < len(vector):
+        raise InvalidArgument("%s: index %d is out of range for a vector of "
+                              "length %d." % (function_name, index, len(vector)))
+
+
+def define_numeric_vector_built_ins(tag):
+    name = tag + 'vector'
+
+    @define_built_in(name + '?')
+    def is_numeric_vector(arguments):
+        check_argument_number(name + '?', arguments, 1, 1)
+
+        if isinstance(arguments[0], NumericVector) and arguments[0].tag == tag:
+            return TRUE
+
+        return FALSE
+
+    @define_built_in('make-' + name)
+    def make_vector(arguments):
+        function_name = 'make-' + name
+        check_argument_number(function_name, arguments, 1, 2)
+
+        length = arguments[0]
+
+        if not isinstance(length, Integer) or length < 0:
+            raise SchemeTypeError("%s takes a non-negative integer length, not %s."
+                                  % (function_name, length))
+
+        if len(arguments) == 2:
+            fill = arguments[1]
+        else:
+            fill = 0
+
+        vector = make_numeric_vector(function_name, tag, [fill])
+        vector.value *= length
+
+        return vector
+
+    @define_built_in(name)
+    def vector(arguments):
+        return make_numeric_vector(name, tag, arguments)
+
+    @define_built_in(name + '-length')
+    def vector_length(arguments):
+        check_argument_number(name + '-length', arguments, 1, 1)
+        check_numeric_vector(name + '-length', tag, arguments[0])
+
+        return len(arguments[0])
+
+    @define_built_in(name + '-ref')
+    def vector_ref(arguments):
+        check_argument_number(name + '-ref', arguments, 2, 2)
+        check_numeric_vector(name + '-ref', tag, arguments[0])
+
+        vector, index = arguments
+        check_index(name + '-ref', vector, index)
+
+        return vector[index]
+
+    @define_built_in(name + '-set!')
+    def vector_set(arguments):
+        function_name = name + '-set!'
+        check_argument_number(function_name, arguments, 3, 3)
+        check_numeric_vector(function_name, tag, arguments[0])
+
+        vector, index, new_value = arguments
+        check_index(function_name, vector, index)
+
+        # check the value fits before we change the vector
+        vector[index] = make_numeric_vector(function_name, tag, [new_value])[0]
+
+        return NIL
+
+    @define_built_in(name + '->list')
+    def vector_to_list(arguments):
+        check_argument_number(name + '->list', arguments, 1, 1)
+        check_numeric_vector(name + '->list', tag, arguments[0])
+
+        return Cons.from_list(arguments[0].value)
+
+    @define_built_in('list->' + name)
+    def list_to_vector(arguments):
+        function_name = 'list->' + name
+        check_argument_number(function_name, arguments, 1, 1)
+
+        return make_numeric_vector(function_name, tag,
+                                   list_elements(arguments[0], function_name))
+
+    @define_built_in(name + '->vector')
+    def vector_to_vector(arguments):
+        check_argument_number(name + '->vector', arguments, 1, 1)
+        check_numeric_vector(name + '->vector', tag, arguments[0])
+
+        return Vector.from_list(arguments[0].value.tolist())
+
+    @define_built_in('vector->' + name)
+    def vector_from_vector(arguments):
+        function_name = 'vector->' + name
+        check_argument_number(function_name, arguments, 1, 1)
+
+        if not isinstance(arguments[0], Vector):
+            raise SchemeTypeError("%s takes a vector, not a %s."
+                                  % (function_name, arguments[0].__class__))
+
+        return make_numeric_vector(function_name, tag, arguments[0].value)
+
+
+for tag in NUMERIC_VECTOR_TYPECODES:
+    define_numeric_vector_built_ins(tag)
@@ -1,8 +1,9 @@
 from .base import define_built_in
 from utils import check_argument_number
 
-from data_types import (Boolean, Character, String, Integer)
+from data_types import (Character, String, Integer, Cons, TRUE, FALSE)
 from errors import SchemeTypeError, InvalidArgument
+from .lists import list_elements
 
 
 @define_built_in('string?')
@@ -10,9 +11,25 @@ def is_string(arguments):
     check_argument_number('string?', arguments, 1, 1)
 
     if isinstance(arguments[0], String):
-        return Boolean(True)
+        return TRUE
 
-    return Boolean(False)
+    return FALSE
+
+
+@define_built_in('string=?')
+def string_equal(arguments):
+    check_argument_number('string=?', arguments, 1)
+
+    for argument in arguments:
+        if not isinstance(argument, String):
+            raise SchemeTypeError("string=? takes only string arguments, got a "
+                                  "%s." % argument.__class__)
+
+    for argument in arguments[1:]:
+        if argument.value != arguments[0].value:
+            return FALSE
+
+    return TRUE
 
 
 @define_built_in('make-string')
@@ -25,14 +42,16 @@ def make_string(arguments):
         raise SchemeTypeError("String length must be an integer, "
                               "got %d." % string_length_atom.__class__)
 
-    string_length = string_length_atom.value
+    string_length = string_length_atom
 
     if string_length < 0:
         raise InvalidArgument("String length must be non-negative, "
                               "got %d." % string_length)
 
+    # we'll probably change this string, so we start with a list of
+    # characters
     if len(arguments) == 1:
-        return String(' ' * string_length)
+        return String.from_characters([' '] * string_length)
 
     else:
         repeated_character_atom = arguments[1]
@@ -42,7 +61,7 @@ def make_string(arguments):
                                   " a character, got a %s." % repeated_character_atom.__class__)
 
         repeated_character = repeated_character_atom.value
-        return String(repeated_character * string_length)
+        return String.from_characters([repeated_character] * string_length)
 
 
 @define_built_in('string-length')
@@ -54,7 +73,7 @@ def string_length(arguments):
         raise SchemeTypeError("string-length takes a string as its argument, "
                               "not a %s." % string_atom.__class__)
 
-    string_length = len(string_atom.value)
+    string_length = len(string_atom)
     return Integer(string_length)
 
 @define_built_in('string-ref')
@@ -71,8 +90,8 @@ def string_ref(arguments):
         raise SchemeTypeError("string-ref takes an integer as its second argument, "
                               "not a %s." % char_index_atom.__class__)
 
-    string = string_atom.value
-    char_index = char_index_atom.value
+    string = string_atom
+    char_index = char_index_atom
 
     if char_index >= len(string):
         # FIXME: this will say 0--1 if string is ""
@@ -101,18 +120,123 @@ def string_set(arguments):
         raise SchemeTypeError("string-set! takes a character as its third argument, "
                               "not a %s." % replacement_char_atom.__class__)
 
-    string = string_atom.value
-    char_index = char_index_atom.value
+    char_index = char_index_atom
 
-    if char_index >= len(string):
+    if char_index >= len(string_atom):
         # FIXME: this will say 0--1 if string is ""
         raise InvalidArgument("String index out of bounds: index must be in"
-                              " the range 0-%d, got %d." % (len(string) - 1, char_index))
+                              " the range 0-%d, got %d." % (len(string_atom) - 1, char_index))
+
+    # this doesn't copy the string, see String
+    string_atom[char_index] = replacement_char_atom.value
+
+    return None
+
+
+def check_string(function_name, string_atom):
+    if not isinstance(string_atom, String):
+        raise SchemeTypeError("%s takes a string as its first argument, "
+                              "not a %s." % (function_name, string_atom.__class__))
+
+
+def string_range(function_name, arguments):
+    """Return the start and end positions given to a function that takes
+    a string and an optional start and end, e.g. (string-copy s 1 3).
+
+    """
+    check_argument_number(function_name, arguments, 1, 3)
+    check_string(function_name, arguments[0])
+
+    positions = arguments[1:]
+
+    for position in positions:
+        if not isinstance(position, Integer):
+            raise SchemeTypeError("%s takes integer positions, not a %s."
+                                  % (function_name, position.__class__))
+
+    start = positions[0] if len(positions) > 0 else 0
+    end = positions[1] if len(positions) > 1 else len(arguments[0])
+
+    if not 0 <= start <= end <= len(arguments[0]):
+        raise InvalidArgument("%s: positions %d to %d are out of range for a "
+                              "string of length %d."
+                              % (function_name, start, end, len(arguments[0])))
+
+    return start, end
+
 
-    characters = list(string)
-    characters[char_index] = replacement_char_atom.value
-    new_string = "".join(characters)
+@define_built_in('string-copy')
+def string_copy(arguments):
+    start, end = string_range('string-copy', arguments)
 
-    string_atom.value = new_string
+    # the copy is likely to be changed, so it gets its own characters
+    return String.from_characters(list(arguments[0].value[start:end]))
+
+
+@define_built_in('substring')
+def substring(arguments):
+    check_argument_number('substring', arguments, 3, 3)
+    start, end = string_range('substring', arguments)
+
+    return String(arguments[0].value[start:end])
+
+
+@define_built_in('string-append')
+def string_append(arguments):
+    for string_atom in arguments:
+        if not isinstance(string_atom, String):
+            raise SchemeTypeError("string-append takes strings, not a %s."
+                                  % string_atom.__class__)
+
+    return String("".join(string_atom.value for string_atom in arguments))
+
+
+@define_built_in('string-append!')
+def string_append_in_place(arguments):
+    """Add strings and characters to the end of a string (SRFI 118).
+    Appending is amortised constant time per character, so this is the
+    way to build a long string piece by piece.
+
+    """
+    check_argument_number('string-append!', arguments, 1)
+    check_string('string-append!', arguments[0])
+
+    # read everything first, since reading a string's value (even the
+    # string we're appending to) joins its characters
+    pieces = []
+
+    for argument in arguments[1:]:
+        if not isinstance(argument, (Character, String)):
+            raise SchemeTypeError("string-append! can only append strings and "
+                                  "characters, not a %s." % argument.__class__)
+
+        pieces.append(argument.value)
+
+    characters = arguments[0].get_characters()
+
+    for piece in pieces:
+        characters.extend(piece)
 
     return None
+
+
+@define_built_in('string->list')
+def string_to_list(arguments):
+    start, end = string_range('string->list', arguments)
+
+    return Cons.from_list(Character(character)
+                          for character in arguments[0].value[start:end])
+
+
+@define_built_in('list->string')
+def list_to_string(arguments):
+    check_argument_number('list->string', arguments, 1, 1)
+
+    characters = list_elements(arguments[0], 'list->string')
+
+    for character in characters:
+        if not isinstance(character, Character):
+            raise SchemeTypeError("list->string takes a list of characters, "
+                                  "not a list containing a %s." % character.__class__)
+
+    return String.from_characters([character.value for character in characters])
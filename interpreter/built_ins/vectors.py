@@ -1,6 +1,8 @@
 from .base import define_built_in
 from utils import check_argument_number
-from data_types import Vector, Boolean, Nil, Integer
+from data_types import (Vector, Cons, Integer, NIL, TRUE, FALSE)
+from errors import SchemeTypeError
+from .lists import list_elements
 
 
 @define_built_in('vector?')
@@ -8,9 +10,9 @@ def is_vector(arguments):
     check_argument_number('make-vector', arguments, 1, 1)
 
     if isinstance(arguments[0], Vector):
-        return Boolean(True)
+        return TRUE
 
-    return Boolean(False)
+    return FALSE
 
 
 @define_built_in('make-vector')
@@ -18,7 +20,7 @@ def make_vector(arguments):
     check_argument_number('make-vector', arguments, 1, 2)
 
     # todo: type check this is an integer
-    vector_length = arguments[0].value
+    vector_length = arguments[0]
 
     vector = Vector(vector_length)
 
@@ -36,7 +38,7 @@ def vector_ref(arguments):
     check_argument_number('vector-ref', arguments, 2, 2)
 
     vector = arguments[0]
-    index = arguments[1].value
+    index = arguments[1]
 
     return vector[index]
 
@@ -46,12 +48,12 @@ def vector_set(arguments):
     check_argument_number('vector-ref', arguments, 3, 3)
 
     vector = arguments[0]
-    index = arguments[1].value
+    index = arguments[1]
     new_value = arguments[2]
 
     vector[index] = new_value
 
-    return Nil()
+    return NIL
 
 
 @define_built_in('vector-length')
@@ -62,3 +64,44 @@ def vector_length(arguments):
     vector = arguments[0]
 
     return Integer(len(vector))
+
+
+@define_built_in('vector')
+def vector(arguments):
+    return Vector.from_list(list(arguments))
+
+
+@define_built_in('vector->list')
+def vector_to_list(arguments):
+    check_argument_number('vector->list', arguments, 1, 1)
+
+    vector = arguments[0]
+
+    if not isinstance(vector, Vector):
+        raise SchemeTypeError("vector->list takes a vector as its argument, "
+                              "not a %s." % vector.__class__)
+
+    return Cons.from_list(vector.value)
+
+
+@define_built_in('list->vector')
+def list_to_vector(arguments):
+    check_argument_number('list->vector', arguments, 1, 1)
+
+    return Vector.from_list(list_elements(arguments[0], 'list->vector'))
+
+
+@define_built_in('vector-fill!')
+def vector_fill(arguments):
+    check_argument_number('vector-fill!', arguments, 2, 2)
+
+    vector = arguments[0]
+
+    if not isinstance(vector, Vector):
+        raise SchemeTypeError("vector-fill! takes a vector as its first argument, "
+                              "not a %s." % vector.__class__)
+
+    for index in range(len(vector)):
+        vector[index] = arguments[1]
+
+    return NIL
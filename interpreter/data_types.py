@@ -1,9 +1,20 @@
-from collections import Sequence
+from abc import ABCMeta
+from array import array
+from io import StringIO
+
 from errors import CircularList
 
+# Every data type uses __slots__, so instances don't have a __dict__
+# and lists stay small.
+#
+# Atoms are immutable (except strings), so we share them where we
+# can: there is only one #t, one #f and one (), characters are cached
+# and symbols are interned.
 
-class Atom(object):
+class Atom(metaclass=ABCMeta):
     """An abstract class for every base type in Scheme."""
+    __slots__ = ('value',)
+
     def __init__(self, value):
         self.value = value
 
@@ -17,30 +28,72 @@ class Atom(object):
         return False
 
 
+def get_external_representation(value):
+    """Return the external representation of any Scheme value."""
+    if isinstance(value, Number):
+        return str(value)
+
+    return value.get_external_representation()
+
+
 class Symbol(Atom):
-    def get_external_representation(self):
-        return self.value
+    """Symbols are interned, so Symbol(name) always returns the same
+    object for the same name and we can compare symbols with `is`.
 
+    """
+    __slots__ = ()
 
-class Number(Atom):
-    def __eq__(self, other):
-        # we allow different types to be equal only for numbers
-        if isinstance(other, Number) and self.value == other.value:
-            return True
+    def __new__(cls, value):
+        symbol = symbols.get(value)
 
-        return False
+        if symbol is None:
+            symbol = object.__new__(cls)
+            symbol.value = value
+            symbols[value] = symbol
+
+        return symbol
+
+    def __init__(self, value):
+        pass
+
+    # there's only one symbol with each name
+    __eq__ = object.__eq__
+    __hash__ = object.__hash__
 
     def get_external_representation(self):
-        return str(self.value)
+        return self.value
+
+
+symbols = {}
+
 
+# Numbers are plain Python ints and floats, so arithmetic doesn't
+# allocate a wrapper for every result. We register them as atoms, so
+# they evaluate to themselves like any other atom.
+Integer = int
+FloatingPoint = float
+Number = (int, float)
 
-class Integer(Number):
-    pass
+Atom.register(int)
+Atom.register(float)
 
-class FloatingPoint(Number):
-    pass
 
 class Boolean(Atom):
+    """There are only two booleans, TRUE and FALSE, so Boolean(value)
+    returns one of them and we can compare booleans with `is`.
+
+    """
+    __slots__ = ()
+
+    def __new__(cls, value):
+        if value:
+            return TRUE
+
+        return FALSE
+
+    def __init__(self, value):
+        pass
+
     def get_external_representation(self):
         if self.value:
             return "#t"
@@ -49,11 +102,89 @@ class Boolean(Atom):
 
 
 class Character(Atom):
+    __slots__ = ()
+
+    def __new__(cls, value):
+        if value in characters:
+            return characters[value]
+
+        character = object.__new__(cls)
+        character.value = value
+        return character
+
+    def __init__(self, value):
+        pass
+
     def get_external_representation(self):
         return "#\%s" % self.value
 
 
+TRUE = object.__new__(Boolean)
+TRUE.value = True
+
+FALSE = object.__new__(Boolean)
+FALSE.value = False
+
+
+characters = {}
+for code_point in range(256):
+    character = object.__new__(Character)
+    character.value = chr(code_point)
+    characters[character.value] = character
+
+
 class String(Atom):
+    """Strings are mutable. We keep a Python str until the string is
+    first changed, then switch to a list of characters, so changing or
+    appending to a string doesn't copy the whole thing. We only join
+    the characters into a str again when something reads `value`.
+
+    """
+    __slots__ = ('characters', 'joined')
+
+    def __init__(self, value):
+        self.characters = None
+        self.joined = value
+
+    @staticmethod
+    def from_characters(characters):
+        """Build a string that owns the list `characters`."""
+        string = String(None)
+        string.characters = characters
+        return string
+
+    @property
+    def value(self):
+        if self.joined is None:
+            self.joined = "".join(self.characters)
+
+        return self.joined
+
+    def get_characters(self):
+        """Return the list of characters, which we may change."""
+        if self.characters is None:
+            self.characters = list(self.joined)
+
+        # our str is about to be out of date
+        self.joined = None
+
+        return self.characters
+
+    def __len__(self):
+        if self.joined is None:
+            return len(self.characters)
+
+        return len(self.joined)
+
+    def __getitem__(self, index):
+        if self.joined is None:
+            return self.characters[index]
+
+        return self.joined[index]
+
+    def __setitem__(self, index, character):
+        self.get_characters()[index] = character
+
     def __repr__(self):
         return "<String: %r>" % self.value
     
@@ -61,102 +192,139 @@ class String(Atom):
         return "%r" % self.value
 
 
-class Cons(Sequence):
+class Cons(object):
+    __slots__ = ('head', 'tail')
+
     @staticmethod
-    def from_list(python_list):
-        if not python_list:
-            return Nil()
-        else:
-            head = python_list[0]
-            tail = Cons.from_list(python_list[1:])
-            return Cons(head, tail)
+    def from_list(elements):
+        """Build a linked list from any iterable, including generators.
+        We add each cell to the end as we go, so this takes linear time
+        and doesn't recurse.
+
+        """
+        first = NIL
+        last = None
+
+        for element in elements:
+            cell = Cons(element)
+
+            if last is None:
+                first = cell
+            else:
+                last.tail = cell
+
+            last = cell
+
+        return first
+
+    def to_list(self):
+        """Return the elements of this list as a Python list. If the
+        list is improper, we stop before the final tail.
+
+        """
+        elements = []
+        element = self
+
+        while isinstance(element, Cons):
+            elements.append(element.head)
+            element = element.tail
+
+        return elements
 
     def __init__(self, head, tail=None):
         self.head = head
 
-        if tail:
-            self.tail = tail
+        if tail is None:
+            self.tail = NIL
         else:
-            self.tail = Nil()
+            self.tail = tail
             
-    def __len__(self):
-        """Find the length of this linked list. We return an error if the list
-        is circular, and handle dotted lists gracefully.
+    def find_end(self):
+        """Walk this list once, returning the number of elements and
+        the final tail (Nil for a proper list). We raise CircularList if
+        the list never ends.
 
-        Since Python doesn't have TCO, we are forced to use an
-        iterative approach.
+        We detect cycles with Floyd's algorithm: a second pointer
+        follows at half speed, and we can only catch up with it if
+        we're going round in a circle. This needs constant memory,
+        unlike keeping a set of the cells we've seen.
 
         """
-        if self.is_circular():
-            raise CircularList("Can't take the length of a circular list.")
-        
         length = 1
-        tail = self.tail
-
-        while True:
-            if isinstance(tail, Nil):
-                # Reached the end of the list.
-                return length
-            elif isinstance(tail, Cons):
-                # Not yet at the end of the list.
-                length += 1
-                tail = tail.tail
-            else:
-                # At the end of an improper list.
-                return length + 1
+        element = self.tail
+        slow = self
 
-    def is_circular(self):
-        tail = self.tail
-        seen_elements = set()
+        while isinstance(element, Cons):
+            if element is slow:
+                raise CircularList("This list is circular, so it has no end.")
 
-        while True:
-            if id(tail) in seen_elements:
-                return True
-            else:
-                # We can't hash our list items, but we're only
-                # interested in checking if it's an item we've seen
-                # before. Using id() is sufficient.
-                seen_elements.add(id(tail))
+            length += 1
+            element = element.tail
 
-            if isinstance(tail, Nil):
-                # Reached the end of the list.
-                return False
-            elif isinstance(tail, Cons):
-                # Not yet at the end of the list.
-                tail = tail.tail
-            else:
-                # At the end of an improper list.
-                return False
+            if length % 2 == 0:
+                slow = slow.tail
+
+        return length, element
+
+    def __len__(self):
+        """Find the length of this linked list. We return an error if the list
+        is circular, and count the final tail of a dotted list as an
+        element.
+
+        """
+        length, tail = self.find_end()
+
+        if tail is NIL:
+            return length
+
+        return length + 1
+
+    def is_circular(self):
+        try:
+            self.find_end()
+        except CircularList:
+            return True
+
+        return False
 
     def is_proper(self):
         """Does this list end with a Nil?"""
-        if self.is_circular():
+        try:
+            length, tail = self.find_end()
+        except CircularList:
             return False
 
-        tail = self.tail
+        return tail is NIL
+
+    def __iter__(self):
+        """Iterate over the elements of this list. If the list is
+        improper, we stop before the final tail.
+
+        """
+        element = self
+
+        while isinstance(element, Cons):
+            yield element.head
+            element = element.tail
+
+    def cell(self, index):
+        """Return the cons cell at this index, walking the list once."""
+        element = self
+
+        while index > 0 and isinstance(element, Cons):
+            element = element.tail
+            index -= 1
+
+        if not isinstance(element, Cons):
+            raise IndexError("list index out of range")
+
+        return element
 
-        while True:
-            if isinstance(tail, Nil):
-                # Reached the end of the list.
-                return True
-            elif isinstance(tail, Cons):
-                # Not yet at the end of the list.
-                tail = tail.tail
-            else:
-                # At the end of an improper list.
-                return False
-                
     def __getitem__(self, index):
-        if index == 0:
-            return self.head
-        else:
-            return self.tail.__getitem__(index - 1)
+        return self.cell(index).head
 
     def __setitem__(self, index, value):
-        if index == 0:
-            self.head = value
-        else:
-            return self.tail.__setitem__(index - 1, value)
+        self.cell(index).head = value
 
     def __repr__(self):
         return "<Cons: %s>" % str(self.get_external_representation())
@@ -166,48 +334,22 @@ class Cons(Sequence):
         return True
 
     def __eq__(self, other):
-        if not isinstance(other, Cons):
-            return False
-
-        element = self
-        other_element = other
-
-        while True:
-            if element.head != other_element.head:
-                return False
-            else:
-                # continue on the list
-                element = element.tail
-                other_element = other_element.tail
-
-                if not isinstance(element, Cons) or not isinstance(other_element, Cons):
-                    return element == other_element
+        return is_equal(self, other)
 
     def get_external_representation(self):
-        if self.is_circular():
-            # todo: find a better way of printing these.
-            return "#<circular list>"
+        output = StringIO()
+        writer.write(self, output)
 
-        contents = ""
-        element = self
+        return output.getvalue()
 
-        while True:
-            if isinstance(element, Nil):
-                # Reached the end of the list.
-                break
-            elif isinstance(element, Cons):
-                # Not yet at the end of the list.
-                contents += " " + element.head.get_external_representation()
-                element = element.tail
-            else:
-                # At the end of an improper list.
-                contents += " . " + element.get_external_representation()
-                break
 
-        return "(%s)" % contents.strip()
+class Nil(object):
+    """There is only one empty list, NIL."""
+    __slots__ = ()
 
+    def __new__(cls):
+        return NIL
 
-class Nil(Sequence):
     def is_circular(self):
         return False
 
@@ -218,6 +360,12 @@ class Nil(Sequence):
     def __len__(self):
         return 0
 
+    def __iter__(self):
+        return iter(())
+
+    def to_list(self):
+        return []
+
     def __getitem__(self, index):
         raise IndexError
 
@@ -239,11 +387,14 @@ class Nil(Sequence):
     def get_external_representation(self):
         return "()"
 
-class Vector(Sequence):
+NIL = object.__new__(Nil)
+
+
+class Vector(object):
+    __slots__ = ('value',)
+
     def __init__(self, length):
-        self.value = []
-        for index in range(length):
-            self.value.append(Nil())
+        self.value = [NIL] * length
 
     def __getitem__(self, index):
         return self.value[index]
@@ -254,16 +405,17 @@ class Vector(Sequence):
     def __len__(self):
         return len(self.value)
 
-    def __eq__(self, other):
-        if isinstance(other, Vector) and self.value == other.value:
-            return True
+    def __iter__(self):
+        return iter(self.value)
 
-        return False
+    def __eq__(self, other):
+        return is_equal(self, other)
 
     def get_external_representation(self):
-        item_reprs = [item.get_external_representation()
-                      for item in self.value]
-        return "#(%s)" % (" ".join(item_reprs))
+        output = StringIO()
+        writer.write(self, output)
+
+        return output.getvalue()
 
     @classmethod
     def from_list(cls, values):
@@ -273,6 +425,246 @@ class Vector(Sequence):
         return vector
 
 
+# the array typecode we use to store each SRFI 4 vector type
+NUMERIC_VECTOR_TYPECODES = {'s8': 'b', 'u8': 'B', 's16': 'h', 'u16': 'H',
+                            's32': 'i', 'u32': 'I', 's64': 'q', 'u64': 'Q',
+                            'f32': 'f', 'f64': 'd'}
+
+
+class NumericVector(object):
+    """A SRFI 4 homogeneous numeric vector, such as an s64vector or an
+    f64vector. The numbers are stored unboxed in an array.array, so
+    this takes far less memory than a Vector of the same numbers.
+
+    """
+    __slots__ = ('tag', 'value')
+
+    def __init__(self, tag, values=()):
+        self.tag = tag
+        self.value = array(NUMERIC_VECTOR_TYPECODES[tag], values)
+
+    def __getitem__(self, index):
+        return self.value[index]
+
+    def __setitem__(self, index, new_value):
+        self.value[index] = new_value
+
+    def __len__(self):
+        return len(self.value)
+
+    def __iter__(self):
+        return iter(self.value)
+
+    def __eq__(self, other):
+        if isinstance(other, NumericVector) and self.tag == other.tag and \
+                self.value == other.value:
+            return True
+
+        return False
+
+    def get_external_representation(self):
+        item_reprs = [get_external_representation(item) for item in self.value]
+        return "#%s(%s)" % (self.tag, " ".join(item_reprs))
+
+
+def is_eqv(first, second):
+    """Numbers and characters are eqv? if they have the same value, and
+    everything else is only eqv? to itself.
+
+    """
+    if first is second:
+        return True
+
+    if isinstance(first, Number):
+        # 2 and 2.0 are =, but they aren't eqv?
+        return type(first) is type(second) and first == second
+
+    if isinstance(first, Character):
+        # characters outside Latin-1 aren't cached
+        return isinstance(second, Character) and first.value == second.value
+
+    return False
+
+
+# types that is_equal compares by their contents
+COMPOUND_TYPES = (Cons, Vector, String, NumericVector)
+
+# how deeply nested is_equal lets pairs and vectors get before it
+# starts checking for cycles
+EQUAL_DEPTH = 1000
+
+
+def is_equal(first, second):
+    """Are first and second equal?? Pairs, vectors and strings are equal?
+    if their contents are, and everything else is compared with eqv?.
+
+    Most values aren't circular, so we first compare without
+    remembering what we've seen. We give up if a list's tail goes
+    round in a circle (which we check for as in Cons.find_end) or the
+    values are nested more than EQUAL_DEPTH deep, since a cycle
+    through heads or vector elements nests forever. We then start
+    again and remember which pairs and vectors we've already matched,
+    as in Adams and Dybvig's "Efficient nondestructive equality
+    checking for trees and graphs". Circular lists are equal? if they
+    unfold to the same infinite list.
+
+    """
+    result = compare_contents(first, second, None)
+
+    if result is None:
+        result = compare_contents(first, second, {})
+
+    return result
+
+
+def find_class(classes, key):
+    """Return the key that represents key's class in the union-find dict
+    `classes`, shortening the path we took as we go.
+
+    """
+    root = key
+
+    while root in classes:
+        root = classes[root]
+
+    while key != root:
+        next_key = classes[key]
+        classes[key] = root
+        key = next_key
+
+    return root
+
+
+def compare_contents(first, second, classes):
+    """Compare first and second with equal? without recursing. If
+    `classes` is None we return None when we might have found a cycle,
+    otherwise `classes` holds the ids of the pairs and vectors that
+    we've assumed are equal so far.
+
+    """
+    stack = [(first, second, 0)]
+
+    while stack:
+        first, second, depth = stack.pop()
+
+        if classes is None and depth > EQUAL_DEPTH:
+            return None
+
+        # we follow tails in this loop, so a long list only takes one
+        # stack entry
+        slow = first
+        length = 0
+
+        # anything we share with second is equal, so we skip it
+        while first is not second:
+            first_type = type(first)
+
+            # values of different types are never equal?
+            if type(second) is not first_type:
+                return False
+
+            if first_type is Cons or first_type is Vector:
+                if classes is not None:
+                    first_class = find_class(classes, id(first))
+                    second_class = find_class(classes, id(second))
+
+                    if first_class == second_class:
+                        break
+
+                    classes[first_class] = second_class
+
+                if first_type is Vector:
+                    if len(first) != len(second):
+                        return False
+
+                    stack.extend((item, other_item, depth + 1)
+                                 for item, other_item in zip(first.value, second.value))
+                    break
+
+                head = first.head
+                other_head = second.head
+
+                if head is not other_head:
+                    head_type = type(head)
+
+                    if head_type is int:
+                        # the commonest case, so we don't call is_eqv
+                        if type(other_head) is not int or head != other_head:
+                            return False
+                    elif head_type in COMPOUND_TYPES:
+                        stack.append((head, other_head, depth + 1))
+                    elif not is_eqv(head, other_head):
+                        return False
+
+                first = first.tail
+                second = second.tail
+
+                if first is slow:
+                    # we've been round this list before
+                    if classes is None:
+                        return None
+                else:
+                    # slow follows at half speed, as in Cons.find_end
+                    length += 1
+
+                    if length & 1 == 0:
+                        slow = slow.tail
+
+            elif first_type is String:
+                if first.value != second.value:
+                    return False
+                break
+
+            elif first_type is NumericVector:
+                if first != second:
+                    return False
+                break
+
+            else:
+                if not is_eqv(first, second):
+                    return False
+                break
+
+    return True
+
+
+class HashTable(object):
+    """A SRFI 69 hash table. `key_function` turns a Scheme key into a
+    Python dict key, such that keys that are the same under the
+    table's equivalence (e.g. eqv?) give the same dict key. We store
+    the original key with its value, so we can give it back later.
+
+    """
+    __slots__ = ('equivalence', 'key_function', 'items')
+
+    def __init__(self, equivalence, key_function):
+        self.equivalence = equivalence
+        self.key_function = key_function
+        self.items = {}
+
+    def __contains__(self, key):
+        return self.key_function(key) in self.items
+
+    def __getitem__(self, key):
+        return self.items[self.key_function(key)][1]
+
+    def __setitem__(self, key, value):
+        self.items[self.key_function(key)] = (key, value)
+
+    def __delitem__(self, key):
+        self.items.pop(self.key_function(key), None)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        """Iterate over (key, value) pairs."""
+        return iter(self.items.values())
+
+    def get_external_representation(self):
+        return "#<hash-table %s>" % self.equivalence
+
+
 """Function classes. These are currently only used in order to add an
 external representation.
 
@@ -308,3 +700,16 @@ class LambdaFunction(Function):
 
     def get_external_representation(self):
         return "#<anonymous function>"
+
+
+class Macro(Function):
+    """A macro defined with defmacro. Calling it with the unevaluated
+    arguments of a macro use returns the expansion.
+
+    """
+    def get_external_representation(self):
+        return "#<macro %s>" % self.name
+
+
+# writer needs the classes above, so we can only import it now
+import writer
@@ -0,0 +1,123 @@
+"""Variables live in one of two places. Globals are stored in cells
+in the global Environment, and local variables are stored in the
+slots of a Frame.
+
+When we analyse code, we resolve every variable reference using
+Scopes, which record the names of the slots in each frame. A local
+variable becomes a (depth, index) pair, and a global becomes a
+reference to its cell, so executing the code never looks a variable
+up by name.
+
+"""
+
+# the value of a cell or slot that hasn't been assigned yet
+UNASSIGNED = object()
+
+
+class Cell(object):
+    """A mutable box holding the value of a global variable."""
+    __slots__ = ('name', 'value')
+
+    def __init__(self, name):
+        self.name = name
+        self.value = UNASSIGNED
+
+
+class Environment(object):
+    """The global environment, mapping variable names to cells. Cells
+    are created when a variable is first referenced, so code can refer
+    to globals that haven't been defined yet.
+
+    """
+    def __init__(self):
+        self.cells = {}
+
+    def cell(self, name):
+        if name not in self.cells:
+            self.cells[name] = Cell(name)
+
+        return self.cells[name]
+
+    def __contains__(self, name):
+        return name in self.cells and self.cells[name].value is not UNASSIGNED
+
+    def __getitem__(self, name):
+        if name not in self:
+            raise KeyError(name)
+
+        return self.cells[name].value
+
+    def __setitem__(self, name, value):
+        self.cell(name).value = value
+
+    def keys(self):
+        """The names of every defined global."""
+        return [name for name in self.cells if name in self]
+
+    # The global environment is also the outermost scope when
+    # analysing code.
+    def resolve(self, name):
+        return None
+
+    def global_environment(self):
+        return self
+
+
+class Frame(object):
+    """The local variables of a function call. `values` holds the
+    slots, in the order given by the function's Scope, and `parent`
+    is the frame (or global environment) the function was defined in.
+
+    """
+    __slots__ = ('values', 'parent')
+
+    def __init__(self, values, parent):
+        self.values = values
+        self.parent = parent
+
+
+class Scope(object):
+    """The names of the slots in a frame, used while analysing code
+    that will run in that frame. The outermost scope's parent is the
+    global environment.
+
+    """
+    def __init__(self, names, parent):
+        self.names = names
+        self.parent = parent
+
+    def resolve(self, name):
+        """Return (depth, index) of the local variable `name`, or None if
+        it's a global.
+
+        """
+        scope = self
+        depth = 0
+
+        while isinstance(scope, Scope):
+            if name in scope.names:
+                return (depth, scope.names.index(name))
+
+            scope = scope.parent
+            depth += 1
+
+        return None
+
+    def global_environment(self):
+        scope = self
+
+        while isinstance(scope, Scope):
+            scope = scope.parent
+
+        return scope
+
+    def keys(self):
+        """Every variable name visible in this scope."""
+        names = set(self.global_environment().keys())
+        scope = self
+
+        while isinstance(scope, Scope):
+            names.update(scope.names)
+            scope = scope.parent
+
+        return names
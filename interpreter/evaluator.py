@@ -1,111 +1,317 @@
-from scheme_parser import parser
-from data_types import Atom, Symbol, BuiltInFunction
+from scheme_parser import read_forms
+from data_types import Atom, Symbol, Function, BuiltInFunction, Macro
 from errors import (UndefinedVariable, SchemeTypeError, SchemeStackOverflow,
                     SchemeSyntaxError)
 from built_ins import built_ins
-from copy import deepcopy
+from environment import Environment, UNASSIGNED
+from difflib import get_close_matches
 
 def load_built_ins(environment):
-
     # a built-in differs from primitives: it always has all its arguments evaluated
     # it also doesn't need the global scope, so we don't pass it for code brevity
-    def arguments_evaluated(function):
-        def decorated_function(arguments, _environment):
-            arguments = deepcopy(arguments)
-            # evaluate the arguments, then pass them to the function
-            for i in range(len(arguments)):
-                (arguments[i], _environment) = eval_s_expression(arguments[i], _environment)
-
-            return (function(arguments), _environment)
-
-        return decorated_function
-
+    # built-ins are given a Python list of the argument values
     for (function_name, function) in built_ins.items():
-        built_in_function = BuiltInFunction(arguments_evaluated(function),
-                                            function_name)
+        built_in_function = BuiltInFunction(function, function_name)
         
         environment[function_name] = built_in_function
 
     return environment
 
 
-def load_standard_library(environment):
+def load_standard_library(environment, engine='analyser', pure_scheme=False):
+    """Evaluate library.scm in environment. Some functions in library.scm
+    are also built-ins, which are much faster, so we keep the built-in
+    unless `pure_scheme` is true. The Scheme versions are the
+    reference implementation.
+
+    """
     with open('standard_library/library.scm') as library_file:
-        library_code = library_file.read()
-        _, environment = eval_program(library_code, environment)
+        _, environment = eval_file(library_file, environment, engine)
+
+    if not pure_scheme:
+        load_built_ins(environment)
 
     return environment
 
 
-def eval_program(program, initial_environment):
+def eval_program(program, initial_environment, engine='analyser'):
+    """Evaluate every s-expression in the string program. `engine`
+    chooses how we execute code: 'analyser' runs analysed closures,
+    and 'vm' compiles to instructions for the bytecode VM in vm.py.
+
+    """
+    return eval_s_expressions(read_forms([program]), initial_environment, engine)
+
+
+def eval_file(program_file, initial_environment, engine='analyser'):
+    """Evaluate every s-expression in an open file. We read the file a
+    line at a time and evaluate each s-expression as soon as we've read
+    it, so a large program starts running straight away and we only
+    hold one s-expression in memory.
+
+    """
+    return eval_s_expressions(read_forms(program_file), initial_environment, engine)
+
+
+def eval_s_expressions(s_expressions, initial_environment, engine):
+    eval_s_expression = engines[engine]
+
     if initial_environment:
         environment = initial_environment
     else:
-        environment = {}
-
-    # a program is a linked list of s-expressions
-    s_expressions = parser.parse(program)
-
-    if not s_expressions:
-        return (None, environment)
+        environment = Environment()
 
     result = None
 
     for s_expression in s_expressions:
+        s_expression = expand_top_level(s_expression, environment)
         result, environment = eval_s_expression(s_expression, environment)
 
     return (result, environment)
 
 
+class TailCall(object):
+    """Returned by a function body instead of a value when the body ends
+    with a function call. call_function makes the call in its own
+    loop, so tail calls don't consume any Python stack.
+
+    As with every function call, `arguments` is a Python list of
+    evaluated arguments.
+
+    """
+    def __init__(self, function, arguments):
+        self.function = function
+        self.arguments = arguments
+
+
+def call_function(function, arguments):
+    """Call a function with a list of evaluated arguments, following any
+    tail calls it makes.
+
+    """
+    result = function(arguments)
+
+    while isinstance(result, TailCall):
+        result = result.function(result.arguments)
+
+    return result
+
+
 def eval_s_expression(s_expression, environment):
+    try:
+        execute = analyse(s_expression, environment)
+        return (execute(environment), environment)
+    except RecursionError:
+        raise SchemeStackOverflow()
+
+
+def analyse(s_expression, scope, tail=False):
+    """Convert s_expression into a Python function that takes an
+    environment and returns the value of s_expression in that
+    environment. All dispatching and syntax checking happens here,
+    so executing the result never needs to look at s_expression
+    again.
+
+    `scope` describes the local variables that will be available
+    when the result is executed (see environment.py). At the top
+    level, this is just the global environment.
+
+    If `tail` is true, s_expression is in tail position in a function
+    body, so function calls return a TailCall rather than calling the
+    function.
+
+    """
     if isinstance(s_expression, Atom):
-        return eval_atom(s_expression, environment)
+        return analyse_atom(s_expression, scope)
     else:
-        try:
-            return eval_list(s_expression, environment)
-        except RuntimeError as e:
-            if e.args[0].startswith("maximum recursion depth exceeded"):
-                raise SchemeStackOverflow()
-            else:
-                raise e
+        return analyse_list(s_expression, scope, tail)
+
 
+def analyse_body(s_expressions, scope, tail):
+    """Analyse a sequence of s-expressions, such as a function body. The
+    value of the sequence is the value of the last s-expression, which
+    is in tail position if the sequence is.
 
-def eval_list(linked_list, environment):
+    """
+    s_expressions = list(s_expressions)
+
+    if not s_expressions:
+        return lambda environment: None
+
+    leading = [analyse(s_expression, scope) for s_expression in s_expressions[:-1]]
+    last = analyse(s_expressions[-1], scope, tail)
+
+    if not leading:
+        return last
+
+    def execute(environment):
+        for execute_s_expression in leading:
+            execute_s_expression(environment)
+
+        return last(environment)
+
+    return execute
+
+
+def analyse_list(linked_list, scope, tail):
     if not linked_list:
         raise SchemeSyntaxError("() is not syntactically valid.")
 
-    # find the function/primitive we are calling
-    function, environment = eval_s_expression(linked_list[0], environment)
+    operator = linked_list[0]
+
+    if isinstance(operator, Symbol) and operator.value in primitives:
+        # We don't allow primitives to be overridden, so we know
+        # this is a primitive now.
+        return primitives[operator.value](linked_list.tail, scope, tail)
 
-    if isinstance(function, Atom):
-        raise SchemeTypeError("You can only call functions, but "
-                              "you gave me a %s." % function.__class__)
+    return analyse_application(linked_list, scope, tail)
 
-    # call it (internally we require the function to decide whether or
-    # not to evaluate the arguments)
-    return function(linked_list.tail, environment)
 
-def eval_atom(atom, environment):
+# How many macro uses we've expanded, and how many times we've reused
+# an earlier expansion instead.
+macro_expansion_counts = {'expanded': 0, 'cached': 0}
+
+
+def analyse_application(linked_list, scope, tail):
+    execute_operator = analyse(linked_list[0], scope)
+    raw_arguments = linked_list.tail
+
+    # The operator might evaluate to a macro, in which case the
+    # arguments aren't expressions. We only analyse them once we know
+    # we're calling a function.
+    execute_arguments = None
+
+    # If it's a macro, we keep the analysed expansion for next
+    # time. Redefining the macro creates a new Macro, so we only reuse
+    # an expansion if the operator is the same Macro as before.
+    expanded_macro = None
+    execute_expansion = None
+
+    def execute(environment):
+        nonlocal execute_arguments, expanded_macro, execute_expansion
+
+        function = execute_operator(environment)
+
+        if isinstance(function, Macro):
+            if function is expanded_macro:
+                macro_expansion_counts['cached'] += 1
+            else:
+                macro_expansion_counts['expanded'] += 1
+
+                s_expression_after_expansion = function(raw_arguments)
+                execute_expansion = analyse(s_expression_after_expansion, scope, tail)
+                expanded_macro = function
+
+            return execute_expansion(environment)
+
+        if not isinstance(function, Function):
+            raise SchemeTypeError("You can only call functions, but "
+                                  "you gave me a %s." % function.__class__)
+
+        if execute_arguments is None:
+            execute_arguments = [analyse(argument, scope) for argument in raw_arguments]
+
+        # we build a fresh list of the argument values, rather than
+        # copying or modifying the s-expression
+        arguments = [execute_argument(environment)
+                     for execute_argument in execute_arguments]
+
+        if tail and not isinstance(function, BuiltInFunction):
+            return TailCall(function, arguments)
+
+        return call_function(function, arguments)
+
+    return execute
+
+
+def analyse_atom(atom, scope):
     # with the exception of symbols, atoms evaluate to themselves
     if isinstance(atom, Symbol):
-        return eval_symbol(atom.value, environment)
+        return analyse_symbol(atom.value, scope)
     else:
-        return (atom, environment)
+        return lambda environment: atom
 
-def eval_symbol(symbol_string, environment):
 
+def analyse_symbol(symbol_string, scope):
     if symbol_string in primitives:
-        # We don't allow primitives to be overridden.
-        return (primitives[symbol_string], environment)
+        raise SchemeSyntaxError("%s is a primitive, so it can't be used as a value."
+                                % symbol_string)
+
+    address = scope.resolve(symbol_string)
+
+    if address is None:
+        return analyse_global(symbol_string, scope)
+
+    depth, index = address
 
-    elif symbol_string in environment:
-        return (environment[symbol_string], environment)
+    # the common cases are variables in this frame or its parent, so
+    # we don't loop for those
+    if depth == 0:
+        def execute(environment):
+            value = environment.values[index]
 
-    elif symbol_string in built_ins:
-        return (built_ins[symbol_string], environment)
+            if value is UNASSIGNED:
+                raise undefined_variable(symbol_string, scope)
+
+            return value
+
+    elif depth == 1:
+        def execute(environment):
+            value = environment.parent.values[index]
+
+            if value is UNASSIGNED:
+                raise undefined_variable(symbol_string, scope)
+
+            return value
 
     else:
-        raise UndefinedVariable('%s has not been defined (environment: %s).' % (symbol_string, sorted(environment.keys())))
+        def execute(environment):
+            for i in range(depth):
+                environment = environment.parent
+
+            value = environment.values[index]
+
+            if value is UNASSIGNED:
+                raise undefined_variable(symbol_string, scope)
+
+            return value
+
+    return execute
+
+
+def analyse_global(symbol_string, scope):
+    cell = scope.global_environment().cell(symbol_string)
+
+    def execute(environment):
+        value = cell.value
 
-# this import has to be after eval_s_expression to avoid circular import issues
+        if value is UNASSIGNED:
+            if symbol_string in built_ins:
+                return BuiltInFunction(built_ins[symbol_string], symbol_string)
+
+            raise undefined_variable(symbol_string, scope)
+
+        return value
+
+    return execute
+
+
+def undefined_variable(symbol_string, scope):
+    """Build the error for a reference to an undefined variable. We only
+    look at what else is defined once we know we need the message.
+
+    """
+    similar_names = get_close_matches(symbol_string, scope.keys())
+
+    if similar_names:
+        return UndefinedVariable('%s has not been defined (did you mean %s?).'
+                                 % (symbol_string, " or ".join(similar_names)))
+
+    return UndefinedVariable('%s has not been defined.' % symbol_string)
+
+# these imports have to be after analyse to avoid circular import issues
 from primitives import primitives
+from expander import expand_top_level
+import vm
+
+engines = {'analyser': eval_s_expression, 'vm': vm.eval_s_expression}
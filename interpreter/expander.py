@@ -0,0 +1,249 @@
+"""Expand macro uses before a top-level form is evaluated, leaving
+only primitives and function calls.
+
+We can only expand uses of global macros that are defined when we
+see the form, and we don't touch a name that is shadowed by a local
+variable. Anything we don't expand here is still expanded when it is
+evaluated.
+
+"""
+from data_types import Atom, Symbol, Cons, Macro
+from evaluator import macro_expansion_counts
+from primitives import find_definitions
+from errors import SchemeStackOverflow
+
+
+def expand(s_expression, environment, local_names=frozenset()):
+    """Return s_expression with every macro use we know about replaced
+    by its expansion. `local_names` holds the local variables in
+    scope, which may shadow global macros.
+
+    """
+    if isinstance(s_expression, Atom) or not s_expression:
+        return s_expression
+
+    # a call with a dotted argument list isn't valid code, so leave it
+    # for evaluation to complain about
+    if not s_expression.is_proper():
+        return s_expression
+
+    operator = s_expression[0]
+
+    if isinstance(operator, Symbol) and operator.value not in local_names:
+        if operator.value in expanders:
+            return expanders[operator.value](s_expression, environment, local_names)
+
+        if operator.value in environment and \
+                isinstance(environment[operator.value], Macro):
+            macro = environment[operator.value]
+            macro_expansion_counts['expanded'] += 1
+
+            # the expansion may itself use macros
+            return expand(macro(s_expression.tail), environment, local_names)
+
+    return expand_all(s_expression, environment, local_names)
+
+
+def expand_top_level(s_expression, environment):
+    """Expand a top-level form. We recurse into nested forms, so deeply
+    nested code overflows the stack here just as it would when it's
+    evaluated.
+
+    """
+    try:
+        return expand(s_expression, environment)
+    except RecursionError:
+        raise SchemeStackOverflow()
+
+
+def expand_all(s_expressions, environment, local_names):
+    return Cons.from_list([expand(s_expression, environment, local_names)
+                           for s_expression in s_expressions])
+
+
+def expand_program(s_expressions, environment, eval_s_expression):
+    """Expand every top-level form in s_expressions, evaluating each one
+    in turn so we know about the macros it defines. We yield each
+    expanded form once it has been evaluated, so we can see what the
+    program looks like without macros.
+
+    """
+    for s_expression in s_expressions:
+        s_expression = expand_top_level(s_expression, environment)
+        eval_s_expression(s_expression, environment)
+
+        yield s_expression
+
+
+expanders = {}
+
+# a decorator for forms whose arguments aren't all expressions
+def define_expander(name):
+    def define_expander_decorator(function):
+        expanders[name] = function
+        return function
+
+    return define_expander_decorator
+
+
+@define_expander('quote')
+@define_expander('defmacro')
+def expand_nothing(s_expression, environment, local_names):
+    # quoted data isn't code, and we don't change macro definitions
+    return s_expression
+
+
+@define_expander('quasiquote')
+def expand_quasiquote(s_expression, environment, local_names):
+    def expand_template(template):
+        if isinstance(template, Atom) or not template or not template.is_proper():
+            return template
+
+        if template[0] in (Symbol('unquote'), Symbol('unquote-splicing')):
+            return Cons(template[0], expand_all(template.tail, environment, local_names))
+
+        return Cons.from_list([expand_template(element) for element in template])
+
+    return Cons(s_expression[0], Cons.from_list([expand_template(template)
+                                                 for template in s_expression.tail]))
+
+
+def expand_function_body(parameters, body, environment, local_names):
+    """Expand a function body, where the parameters and any internal
+    definitions are local variables.
+
+    """
+    parameter_names = [parameter.value for parameter in parameters
+                       if isinstance(parameter, Symbol)]
+    body_names = local_names.union(parameter_names, find_definitions(body))
+
+    return expand_all(body, environment, body_names)
+
+
+@define_expander('lambda')
+def expand_lambda(s_expression, environment, local_names):
+    if len(s_expression) < 3 or isinstance(s_expression[1], Atom):
+        return s_expression
+
+    parameters = s_expression[1]
+    body = expand_function_body(parameters, s_expression.tail.tail,
+                                environment, local_names)
+
+    return Cons(s_expression[0], Cons(parameters, body))
+
+
+@define_expander('define')
+def expand_define(s_expression, environment, local_names):
+    if len(s_expression) < 3:
+        return s_expression
+
+    if isinstance(s_expression[1], Atom):
+        # (define name value)
+        return Cons(s_expression[0], Cons(s_expression[1],
+                                          expand_all(s_expression.tail.tail,
+                                                     environment, local_names)))
+
+    # (define (name parameter ...) body ...)
+    signature = s_expression[1]
+    body = expand_function_body(signature.tail, s_expression.tail.tail,
+                                environment, local_names)
+
+    return Cons(s_expression[0], Cons(signature, body))
+
+
+def expand_bindings(bindings, environment, local_names):
+    """Expand the values in a list of let bindings, returning the names
+    and the new bindings, or None if the bindings aren't valid.
+
+    """
+    if isinstance(bindings, Atom):
+        return None
+
+    names = []
+    expanded_bindings = []
+
+    for binding in bindings:
+        if isinstance(binding, Atom) or not binding or not binding.is_proper():
+            return None
+
+        names.append(binding[0])
+        expanded_bindings.append(Cons(binding[0], expand_all(binding.tail, environment,
+                                                             local_names)))
+
+    return names, Cons.from_list(expanded_bindings)
+
+
+@define_expander('let')
+def expand_let(s_expression, environment, local_names):
+    if len(s_expression) < 3:
+        return s_expression
+
+    if isinstance(s_expression[1], Symbol):
+        # (let name bindings body ...), where name is only visible in the body
+        loop_name = s_expression[1]
+        parts = s_expression.tail.tail
+        body_names = local_names.union([loop_name.value])
+    else:
+        loop_name = None
+        parts = s_expression.tail
+        body_names = local_names
+
+    expanded = expand_bindings(parts[0], environment, local_names)
+
+    # leave invalid lets for evaluation to complain about
+    if expanded is None or not parts.tail:
+        return s_expression
+
+    names, bindings = expanded
+    body = expand_function_body(names, parts.tail, environment, body_names)
+
+    if loop_name is None:
+        return Cons(s_expression[0], Cons(bindings, body))
+
+    return Cons(s_expression[0], Cons(loop_name, Cons(bindings, body)))
+
+
+@define_expander('cond')
+def expand_cond(s_expression, environment, local_names):
+    clauses = []
+
+    for clause in s_expression.tail:
+        if isinstance(clause, Atom) or not clause or not clause.is_proper():
+            clauses.append(clause)
+        else:
+            # every part of a clause is an expression (else and => are
+            # just symbols, so expanding them does nothing)
+            clauses.append(expand_all(clause, environment, local_names))
+
+    return Cons(s_expression[0], Cons.from_list(clauses))
+
+
+@define_expander('do')
+def expand_do(s_expression, environment, local_names):
+    if len(s_expression) < 3 or isinstance(s_expression[1], Atom):
+        return s_expression
+
+    bindings = []
+    names = []
+
+    for binding in s_expression[1]:
+        # leave invalid bindings for evaluation to complain about
+        if isinstance(binding, Atom) or not binding or not binding.is_proper() or \
+                len(binding) not in (2, 3):
+            return s_expression
+
+        names.append(binding[0])
+        bindings.append(binding)
+
+    loop_names = local_names.union(name.value for name in names
+                                   if isinstance(name, Symbol))
+
+    # initial values are outside the loop, steps are inside it
+    expanded_bindings = [Cons(binding[0], Cons(expand(binding[1], environment, local_names),
+                                               expand_all(binding.tail.tail, environment,
+                                                          loop_names)))
+                         for binding in bindings]
+
+    return Cons(s_expression[0], Cons(Cons.from_list(expanded_bindings),
+                                      expand_all(s_expression.tail.tail,
+                                                 environment, loop_names)))
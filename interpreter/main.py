@@ -4,15 +4,21 @@ import sys
 import os
 import cmd
 
-from evaluator import eval_program, load_standard_library, load_built_ins
+from evaluator import (eval_program, eval_file, load_standard_library, load_built_ins,
+                       engines, macro_expansion_counts)
+from expander import expand_program
+from scheme_parser import read_forms
+from environment import Environment
+from writer import write
 from errors import InterpreterException, SchemeSyntaxError, SchemeTypeError
 
 class Repl(cmd.Cmd):
     intro = "Welcome to Minimal Scheme 0.2 alpha."
     prompt = "scheme> "
 
-    def __init__(self, initial_environment):
+    def __init__(self, initial_environment, engine):
         self.environment = initial_environment
+        self.engine = engine
         super().__init__()
 
     def onecmd(self, program):
@@ -21,15 +27,12 @@ class Repl(cmd.Cmd):
             sys.exit(0)
 
         try:
-            result, self.environment = eval_program(program, self.environment)
+            result, self.environment = eval_program(program, self.environment,
+                                                    self.engine)
 
             if not result is None:
-                if hasattr(result, "get_external_representation"):
-                    # is an atom or list
-                    print(result.get_external_representation())
-                else:
-                    # function object
-                    print(result)
+                write(result, sys.stdout)
+                print()
 
         except SchemeSyntaxError as e:
             print("Syntax error: %s" % e.message)
@@ -40,24 +43,57 @@ class Repl(cmd.Cmd):
 
 
 if __name__ == '__main__':
-    environment = {}
+    arguments = sys.argv[1:]
+    engine = 'analyser'
+
+    if '--vm' in arguments:
+        arguments.remove('--vm')
+        engine = 'vm'
+
+    # print the program with its macros expanded
+    show_expansion = '--expand' in arguments
+    if show_expansion:
+        arguments.remove('--expand')
+
+    # print how often we expanded macros, and how often we reused an
+    # earlier expansion
+    show_stats = '--stats' in arguments
+    if show_stats:
+        arguments.remove('--stats')
+
+    environment = Environment()
     environment = load_built_ins(environment)
-    environment = load_standard_library(environment)
+    environment = load_standard_library(environment, engine)
 
-    if len(sys.argv) > 1:
+    if arguments:
         # program file passed in
-        path = os.path.abspath(sys.argv[1])
-        program = open(path, 'r').read()
+        path = os.path.abspath(arguments[0])
+        program_file = open(path, 'r')
 
         try:
-            eval_program(program, environment)
+            if show_expansion:
+                s_expressions = read_forms(program_file)
+
+                for s_expression in expand_program(s_expressions, environment,
+                                                   engines[engine]):
+                    write(s_expression, sys.stdout)
+                    print()
+            else:
+                # we read and evaluate one s-expression at a time
+                eval_file(program_file, environment, engine)
         except SchemeSyntaxError as e:
             print("Syntax error: %s" % e.message)
         except SchemeTypeError as e:
             print("Type error: %s" % e.message)
         except InterpreterException as e:
             print("Error: %s" % e.message)
+        finally:
+            program_file.close()
+
+        if show_stats:
+            print("Macro expansions: %d, reused: %d" % (macro_expansion_counts['expanded'],
+                                                      macro_expansion_counts['cached']))
 
     else:
         # interactive mode
-        Repl(environment).cmdloop()
+        Repl(environment, engine).cmdloop()
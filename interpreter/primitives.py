@@ -1,8 +1,15 @@
-from evaluator import eval_s_expression
+"""Primitives are analysed rather than called. A primitive takes its
+unevaluated arguments, the scope it appears in and whether it is in
+tail position, and returns a Python function that takes an
+environment and evaluates the primitive in it.
+
+"""
+from evaluator import analyse, analyse_body, call_function, TailCall
 from errors import (SchemeTypeError, RedefinedVariable, SchemeSyntaxError, UndefinedVariable,
                     SchemeArityError)
-from data_types import Nil, Cons, Atom, Symbol, Boolean, UserFunction, LambdaFunction
-from copy import deepcopy
+from data_types import (NIL, TRUE, FALSE, Cons, Atom, Symbol, Function, BuiltInFunction,
+                        UserFunction, LambdaFunction, Macro)
+from environment import Frame, Scope, UNASSIGNED
 from utils import check_argument_number
 
 primitives = {}
@@ -18,33 +25,111 @@ def define_primitive(function_name):
     return define_primitive_decorator
 
 
+def find_definitions(function_body):
+    """Return the names defined by define (or defmacro) forms in
+    function_body. These are local variables, so they need slots in
+    the function's frame.
+
+    """
+    names = []
+
+    for s_expression in function_body:
+        if not isinstance(s_expression, Cons):
+            continue
+
+        if s_expression[0] in (Symbol('define'), Symbol('defmacro')) and \
+                len(s_expression) > 1:
+            name = s_expression[1]
+
+            # (define (foo ...) ...) defines foo
+            if isinstance(name, Cons):
+                name = name[0]
+
+            if isinstance(name, Symbol) and name.value not in names:
+                names.append(name.value)
+
+        elif s_expression[0] is Symbol('begin'):
+            for name in find_definitions(s_expression.tail):
+                if name not in names:
+                    names.append(name)
+
+    return names
+
+
+def function_scope(parameter_names, function_body, scope):
+    """Build the scope for the body of a function. The frame holds the
+    parameters, followed by any variables defined in the body.
+
+    """
+    names = list(parameter_names)
+
+    for name in find_definitions(function_body):
+        if name not in names:
+            names.append(name)
+
+    return Scope(names, scope)
+
+
+def analyse_definition(variable_name, scope, check_redefinition):
+    """Return a function that takes an environment and a value, and
+    defines variable_name in the current frame, or as a global if we
+    are at the top level.
+
+    """
+    if not isinstance(scope, Scope):
+        cell = scope.cell(variable_name)
+
+        def define_global(environment, value):
+            if check_redefinition and cell.value is not UNASSIGNED:
+                raise RedefinedVariable("Cannot define %s, as it has already been defined." % variable_name)
+
+            cell.value = value
+
+        return define_global
+
+    if variable_name not in scope.names:
+        raise SchemeSyntaxError("Local definitions must be at the top level of "
+                                "a function body, but %s isn't." % variable_name)
+
+    index = scope.names.index(variable_name)
+
+    def define_local(environment, value):
+        if check_redefinition and environment.values[index] is not UNASSIGNED:
+            raise RedefinedVariable("Cannot define %s, as it has already been defined." % variable_name)
+
+        environment.values[index] = value
+
+    return define_local
+
+
 @define_primitive('define')
-def define(arguments, environment):
+def define(arguments, scope, tail):
     check_argument_number('define', arguments, 2)
 
     if isinstance(arguments[0], Atom):
-        return define_variable(arguments, environment)
+        return define_variable(arguments, scope)
     else:
-        return define_function(arguments, environment)
+        return define_function(arguments, scope)
 
 
-def define_variable(arguments, environment):
+def define_variable(arguments, scope):
     if not isinstance(arguments[0], Symbol):
         raise SchemeTypeError("Tried to assign to a %s, which isn't a symbol." % arguments[0].__class__)
 
-    if arguments[0].value in environment:
-        raise RedefinedVariable("Cannot define %s, as it has already been defined." % arguments[0].value)
-
     variable_name = arguments[0].value
-    variable_value_expression = arguments[1]
+    execute_value = analyse(arguments[1], scope)
+
+    # we only prevent redefinition in the current frame, since a
+    # local definition may mask a global
+    define_in_frame = analyse_definition(variable_name, scope, True)
 
-    result, environment = eval_s_expression(variable_value_expression, environment)
-    environment[variable_name] = result
+    def execute(environment):
+        define_in_frame(environment, execute_value(environment))
 
-    return (None, environment)
+    return execute
 
 
-def define_function(arguments, environment):
+def define_function(arguments, scope):
     function_name_with_parameters = arguments[0]
     function_name = function_name_with_parameters[0]
 
@@ -69,64 +154,45 @@ def define_function(arguments, environment):
                 is_variadic = True
 
     if is_variadic:
-        return define_variadic_function(arguments, environment)
+        return define_variadic_function(arguments, scope)
     else:
-        return define_normal_function(arguments, environment)
+        return define_normal_function(arguments, scope)
 
 
-def define_normal_function(arguments, environment):
+def define_normal_function(arguments, scope):
     function_name_with_parameters = arguments[0]
-    function_name = function_name_with_parameters[0]
-    function_parameters = function_name_with_parameters.tail
+    function_name = function_name_with_parameters[0].value
+    function_parameters = [parameter.value for parameter in function_name_with_parameters.tail]
 
-    function_body = arguments.tail
-    
-    # a function with a fixed number of arguments
-    def named_function(_arguments, _environment):
-        check_argument_number(function_name.value, _arguments,
-                              len(function_parameters), len(function_parameters))
+    define_in_frame = analyse_definition(function_name, scope, False)
 
-        local_environment = {}
+    body_scope = function_scope(function_parameters, arguments.tail, scope)
+    execute_body = analyse_body(arguments.tail, body_scope, True)
+    local_definitions = [UNASSIGNED] * (len(body_scope.names) - len(function_parameters))
 
-        # evaluate arguments
-        _arguments = deepcopy(_arguments)
-        for i in range(len(_arguments)):
-            (_arguments[i], _environment) = eval_s_expression(_arguments[i], _environment)
+    def execute(environment):
+        # a function with a fixed number of arguments
+        def named_function(_arguments):
+            check_argument_number(function_name, _arguments,
+                                  len(function_parameters), len(function_parameters))
 
-        # assign to parameters
-        for (parameter_name, parameter_value) in zip(function_parameters,
-                                                     _arguments):
-            local_environment[parameter_name.value] = parameter_value
+            # create a frame for our parameters inside the environment
+            # the function was defined in
+            values = _arguments + local_definitions
+            return execute_body(Frame(values, environment))
 
-        # create new environment, where local variables mask globals
-        new_environment = dict(_environment, **local_environment)
+        # assign this function to this name
+        define_in_frame(environment, UserFunction(named_function, function_name))
 
-        # evaluate the function block
-        for s_exp in function_body:
-            result, new_environment = eval_s_expression(s_exp, new_environment)
+    return execute
 
-        # update any global variables that weren't masked
-        for variable_name in _environment:
-            if variable_name not in local_environment:
-                _environment[variable_name] = new_environment[variable_name]
 
-        return (result, _environment)
-
-    # assign this function to this name
-    environment[function_name.value] = UserFunction(named_function,
-                                                    function_name.value)
-
-    return (None, environment)
-
-
-def define_variadic_function(arguments, environment):
+def define_variadic_function(arguments, scope):
     function_name_with_parameters = arguments[0]
-    function_name = arguments[0][0]
-    function_parameters = function_name_with_parameters.tail
+    function_name = arguments[0][0].value
+    function_parameters = [parameter.value for parameter in function_name_with_parameters.tail]
 
-    function_body = arguments.tail
-    
-    dot_position = function_parameters.index(Symbol('.'))
+    dot_position = function_parameters.index('.')
 
     if dot_position < len(function_parameters) - 2:
         raise SchemeSyntaxError("You can only have one improper list "
@@ -134,108 +200,104 @@ def define_variadic_function(arguments, environment):
     if dot_position == len(function_parameters) - 1:
         raise SchemeSyntaxError("Must name an improper list parameter after '.'.")
 
-    def named_variadic_function(_arguments, _environment):
-        # a function that takes a variable number of arguments
-        if dot_position == 0:
-            explicit_parameters = Nil()
-        else:
-            explicit_parameters = deepcopy(function_parameters)
+    explicit_parameters = function_parameters[:dot_position]
+    improper_list_parameter = function_parameters[dot_position + 1]
 
-            # create a linked list holding all the parameters before the dot
-            current_head = explicit_parameters
+    define_in_frame = analyse_definition(function_name, scope, False)
 
-            # find the position in the list just before the dot
-            for i in range(dot_position - 2):
-                current_head = current_head.tail
+    body_scope = function_scope(explicit_parameters + [improper_list_parameter],
+                                arguments.tail, scope)
+    execute_body = analyse_body(arguments.tail, body_scope, True)
+    local_definitions = [UNASSIGNED] * (len(body_scope.names) - len(explicit_parameters) - 1)
 
-            # then remove the rest of the list
-            current_head.tail = Nil()
+    def execute(environment):
+        def named_variadic_function(_arguments):
+            # check we have been given sufficient arguments for our explicit parameters
+            check_argument_number(function_name, _arguments,
+                                  len(explicit_parameters))
 
-        improper_list_parameter = function_parameters[dot_position + 1]
+            # assign parameters
+            values = _arguments[:len(explicit_parameters)]
 
-        # check we have been given sufficient arguments for our explicit parameters
-        check_argument_number(function_name.value, _arguments,
-                              len(explicit_parameters))
+            # put the remaining arguments in our improper parameter
+            remaining_arguments = Cons.from_list(_arguments[len(explicit_parameters):])
+            values.append(remaining_arguments)
 
-        local_environment = {}
+            return execute_body(Frame(values + local_definitions, environment))
 
-        # evaluate arguments
-        _arguments = deepcopy(_arguments)
-        for i in range(len(_arguments)):
-            (_arguments[i], _environment) = eval_s_expression(_arguments[i], _environment)
+        # assign this function to this name
+        define_in_frame(environment, UserFunction(named_variadic_function,
+                                                  function_name))
 
-        # assign parameters
-        for (parameter, parameter_value) in zip(explicit_parameters,
-                                                _arguments):
-            local_environment[parameter] = parameter_value
+    return execute
 
-        # put the remaining arguments in our improper parameter
-        remaining_arguments = _arguments
-        for i in range(len(explicit_parameters)):
-            remaining_arguments = remaining_arguments.tail
 
-        local_environment[improper_list_parameter.value] = remaining_arguments
+@define_primitive('set!')
+def set_variable(arguments, scope, tail):
+    check_argument_number('set!', arguments, 2, 2)
 
-        new_environment = dict(_environment, **local_environment)
+    variable_name = arguments[0]
 
-        # evaluate our function_body in this environment
-        for s_exp in function_body:
-            result, new_environment = eval_s_expression(s_exp, new_environment)
+    if not isinstance(variable_name, Symbol):
+        raise SchemeTypeError("Tried to assign to a %s, which isn't a symbol." % variable_name.__class__)
 
-        # update global variables that weren't masked by locals
-        for variable_name in _environment:
-            if variable_name not in local_environment:
-                _environment[variable_name] = new_environment[variable_name]
+    variable_name = variable_name.value
+    execute_value = analyse(arguments[1], scope)
 
-        return (result, _environment)
+    address = scope.resolve(variable_name)
 
-    # assign this function to this name
-    environment[function_name.value] = UserFunction(named_variadic_function,
-                                                    function_name.value)
+    if address is None:
+        cell = scope.global_environment().cell(variable_name)
 
-    return (None, environment)
+        def execute(environment):
+            if cell.value is UNASSIGNED:
+                raise UndefinedVariable("Can't assign to undefined variable %s." % variable_name)
 
+            cell.value = execute_value(environment)
 
-@define_primitive('set!')
-def set_variable(arguments, environment):
-    check_argument_number('set!', arguments, 2, 2)
+    else:
+        depth, index = address
 
-    variable_name = arguments[0]
+        def execute(environment):
+            frame = environment
+            for i in range(depth):
+                frame = frame.parent
 
-    if not isinstance(variable_name, Symbol):
-        raise SchemeTypeError("Tried to assign to a %s, which isn't a symbol." % variable_name.__class__)
+            if frame.values[index] is UNASSIGNED:
+                raise UndefinedVariable("Can't assign to undefined variable %s." % variable_name)
 
-    if variable_name.value not in environment:
-        raise UndefinedVariable("Can't assign to undefined variable %s." % variable_name.value)
+            frame.values[index] = execute_value(environment)
 
-    variable_value_expression = arguments[1]
-    result, environment = eval_s_expression(variable_value_expression, environment)
-    environment[variable_name.value] = result
+    return execute
 
-    return (None, environment)
 
 @define_primitive('if')
-def if_function(arguments, environment):
+def if_function(arguments, scope, tail):
     check_argument_number('if', arguments, 2, 3)
 
-    condition, environment = eval_s_expression(arguments[0], environment)
+    execute_condition = analyse(arguments[0], scope)
+    execute_then = analyse(arguments[1], scope, tail)
 
-    # everything except an explicit false boolean is true
-    if not condition == Boolean(False):
-        then_expression = arguments[1]
-        return eval_s_expression(then_expression, environment)
+    if len(arguments) == 3:
+        execute_else = analyse(arguments[2], scope, tail)
     else:
-        if len(arguments) == 3:
-            else_expression = arguments[2]
-            return eval_s_expression(else_expression, environment)
+        execute_else = lambda environment: None
+
+    def execute(environment):
+        # everything except an explicit false boolean is true
+        if execute_condition(environment) is not FALSE:
+            return execute_then(environment)
+        else:
+            return execute_else(environment)
+
+    return execute
 
 
 @define_primitive('lambda')
-def make_lambda_function(arguments, environment):
+def make_lambda_function(arguments, scope, tail):
     check_argument_number('lambda', arguments, 2)
 
     parameter_list = arguments[0]
-    function_body = arguments.tail
 
     if isinstance(parameter_list, Atom):
         raise SchemeTypeError("The first argument to `lambda` must be a list of variables.")
@@ -244,104 +306,418 @@ def make_lambda_function(arguments, environment):
         if not isinstance(parameter, Symbol):
             raise SchemeTypeError("Parameters of lambda functions must be symbols, not %s." % parameter.__class__)
 
-    def lambda_function(_arguments, _environment):
-        check_argument_number('(anonymous function)', _arguments,
-                              len(parameter_list), len(parameter_list))
+    parameter_names = [parameter.value for parameter in parameter_list]
 
-        local_environment = {}
+    body_scope = function_scope(parameter_names, arguments.tail, scope)
+    execute_body = analyse_body(arguments.tail, body_scope, True)
+    local_definitions = [UNASSIGNED] * (len(body_scope.names) - len(parameter_names))
 
-        for (parameter_name, parameter_expression) in zip(parameter_list,
-                                                          _arguments):
-            local_environment[parameter_name.value], _environment = eval_s_expression(parameter_expression, _environment)
+    def execute(environment):
+        def lambda_function(_arguments):
+            check_argument_number('(anonymous function)', _arguments,
+                                  len(parameter_names), len(parameter_names))
 
-        new_environment = dict(_environment, **local_environment)
+            # the frame for our parameters is inside the environment the
+            # lambda was created in, so we close over its variables
+            values = _arguments + local_definitions
 
-        # now we have set up the correct scope, evaluate our function block
-        for s_exp in function_body:
-            result, new_environment = eval_s_expression(s_exp, new_environment)
+            # now we have set up the correct scope, evaluate our function block
+            return execute_body(Frame(values, environment))
 
-        # update any global variables that weren't masked
-        for variable_name in _environment:
-            if variable_name not in local_environment:
-                _environment[variable_name] = new_environment[variable_name]
+        return LambdaFunction(lambda_function)
 
-        return (result, _environment)
-
-    return (LambdaFunction(lambda_function), environment)
+    return execute
 
 
 @define_primitive('quote')
-def return_argument_unevaluated(arguments, environment):
+def return_argument_unevaluated(arguments, scope, tail):
     check_argument_number('quote', arguments, 1, 1)
 
-    return (arguments[0], environment)
+    value = arguments[0]
+    return lambda environment: value
 
 
 @define_primitive('begin')
-def evaluate_sequence(arguments, environment):
-    result = None
+def evaluate_sequence(arguments, scope, tail):
+    # the last s-expression is in tail position if the begin is
+    return analyse_body(arguments, scope, tail)
+
+
+def parse_let_bindings(bindings):
+    """Return the names and value s-expressions of the bindings in a let
+    expression: ((name value) ...).
+
+    """
+    if isinstance(bindings, Atom):
+        raise SchemeTypeError("The first argument to `let` must be a list of bindings.")
+
+    names = []
+    values = []
+
+    for binding in bindings:
+        if isinstance(binding, Atom) or len(binding) != 2 or \
+                not isinstance(binding[0], Symbol):
+            raise SchemeSyntaxError("Each binding in `let` must be a symbol "
+                                    "and a value, e.g. (x 1).")
+
+        names.append(binding[0].value)
+        values.append(binding[1])
+
+    return names, values
+
+
+@define_primitive('let')
+def let(arguments, scope, tail):
+    """Evaluate the body with the given variables bound. This is the
+    same as calling a lambda, but we don't create a function.
+
+    Syntax:
+    (let ((<name> <value>) ...) <body> ...)
+    (let <loop name> ((<name> <value>) ...) <body> ...)
+
+    """
+    check_argument_number('let', arguments, 2)
+
+    if isinstance(arguments[0], Symbol):
+        return named_let(arguments, scope, tail)
+
+    names, value_s_expressions = parse_let_bindings(arguments[0])
+    execute_values = [analyse(value, scope) for value in value_s_expressions]
+
+    body_scope = function_scope(names, arguments.tail, scope)
+    execute_body = analyse_body(arguments.tail, body_scope, tail)
+    local_definitions = [UNASSIGNED] * (len(body_scope.names) - len(names))
+
+    def execute(environment):
+        values = [execute_value(environment) for execute_value in execute_values]
+        return execute_body(Frame(values + local_definitions, environment))
+
+    return execute
+
+
+def named_let(arguments, scope, tail):
+    """A named let binds the loop name to a function whose body is the
+    body of the let, then calls it with the initial values. Calling
+    the loop name in tail position is a tail call, so the loop runs in
+    the trampoline in call_function without using any stack.
+
+    """
+    check_argument_number('let', arguments, 3)
+
+    loop_name = arguments[0].value
+    names, value_s_expressions = parse_let_bindings(arguments[1])
+    execute_values = [analyse(value, scope) for value in value_s_expressions]
+
+    # the loop function is the only variable in a frame between the
+    # surrounding code and the loop body
+    loop_scope = Scope([loop_name], scope)
+    body = arguments.tail.tail
+    body_scope = function_scope(names, body, loop_scope)
+    execute_body = analyse_body(body, body_scope, True)
+    local_definitions = [UNASSIGNED] * (len(body_scope.names) - len(names))
+
+    def execute(environment):
+        loop_frame = Frame([UNASSIGNED], environment)
+
+        def loop_function(_arguments):
+            check_argument_number(loop_name, _arguments, len(names), len(names))
+            return execute_body(Frame(_arguments + local_definitions, loop_frame))
+
+        loop = UserFunction(loop_function, loop_name)
+        loop_frame.values[0] = loop
+
+        values = [execute_value(environment) for execute_value in execute_values]
+
+        if tail:
+            return TailCall(loop, values)
+
+        return call_function(loop, values)
+
+    return execute
+
 
-    for argument in arguments:
-        result, environment = eval_s_expression(argument, environment)
+def parse_do_bindings(bindings):
+    """Return the names, initial values and steps of the bindings in a
+    do loop: ((name init step) ...). A variable without a step keeps
+    its value, so its step is just its name.
 
-    return (result, environment)
+    """
+    if isinstance(bindings, Atom):
+        raise SchemeTypeError("The first argument to `do` must be a list of bindings.")
+
+    names = []
+    inits = []
+    steps = []
+
+    for binding in bindings:
+        if isinstance(binding, Atom) or len(binding) not in (2, 3) or \
+                not isinstance(binding[0], Symbol):
+            raise SchemeSyntaxError("Each binding in `do` must be a symbol, an "
+                                    "initial value and an optional step, e.g. (i 0 (+ i 1)).")
+
+        names.append(binding[0].value)
+        inits.append(binding[1])
+
+        if len(binding) == 3:
+            steps.append(binding[2])
+        else:
+            steps.append(binding[0])
+
+    return names, inits, steps
+
+
+@define_primitive('do')
+def do(arguments, scope, tail):
+    """Loop until the test is true, evaluating the commands and then
+    rebinding each variable to the value of its step. Returns the
+    value of the last result expression.
+
+    Syntax:
+    (do ((<name> <init> <step>) ...) (<test> <result> ...) <command> ...)
+
+    """
+    check_argument_number('do', arguments, 2)
+
+    names, inits, steps = parse_do_bindings(arguments[0])
+    test_clause = arguments[1]
+
+    if isinstance(test_clause, Atom) or not test_clause:
+        raise SchemeSyntaxError("The second argument to `do` must be a list "
+                                "containing a test.")
+
+    execute_inits = [analyse(init, scope) for init in inits]
+
+    # the commands can't contain definitions, so the frame is just the variables
+    loop_scope = Scope(names, scope)
+    execute_test = analyse(test_clause[0], loop_scope)
+    execute_result = analyse_body(test_clause.tail, loop_scope, tail)
+    execute_commands = [analyse(command, loop_scope) for command in arguments.tail.tail]
+    execute_steps = [analyse(step, loop_scope) for step in steps]
+
+    def execute(environment):
+        values = [execute_init(environment) for execute_init in execute_inits]
+
+        while True:
+            # each iteration gets a fresh frame, so closures created in
+            # one iteration don't see later values
+            frame = Frame(values, environment)
+
+            # everything except an explicit false boolean is true
+            if execute_test(frame) is not FALSE:
+                return execute_result(frame)
+
+            for execute_command in execute_commands:
+                execute_command(frame)
+
+            values = [execute_step(frame) for execute_step in execute_steps]
+
+    return execute
+
+
+def parse_cond_clause(clause):
+    """Return the kind of a cond clause ('else', '=>' or 'test'), its
+    test and the s-expressions after the test.
+
+    """
+    if isinstance(clause, Atom) or not clause:
+        raise SchemeSyntaxError("cond clauses must be lists, e.g. ((< x 0) 'negative).")
+
+    if clause[0] is Symbol('else'):
+        if not clause.tail:
+            raise SchemeSyntaxError("An else clause in cond must have a body.")
+
+        return 'else', None, clause.tail
+
+    if len(clause) > 1 and clause[1] is Symbol('=>'):
+        if len(clause) != 3:
+            raise SchemeSyntaxError("A cond clause with => must have exactly one receiver.")
+
+        return '=>', clause[0], clause.tail.tail
+
+    return 'test', clause[0], clause.tail
+
+
+@define_primitive('cond')
+def cond(arguments, scope, tail):
+    """Evaluate the body of the first clause whose test is true. A
+    clause without a body returns the value of its test, and a clause
+    of the form (test => receiver) calls receiver with the value of
+    test. If no test is true, the value is unspecified.
+
+    Syntax:
+    (cond (<test> <body> ...) ... (else <body> ...))
+
+    """
+    clauses = []
+
+    for position, clause in enumerate(arguments):
+        kind, test, body = parse_cond_clause(clause)
+
+        if kind == 'else' and position != len(arguments) - 1:
+            raise SchemeSyntaxError("else must be the last clause in cond.")
+
+        if test is None:
+            execute_test = None
+        else:
+            execute_test = analyse(test, scope)
+
+        if kind == '=>':
+            execute_body = analyse(body[0], scope)
+        elif body:
+            execute_body = analyse_body(body, scope, tail)
+        else:
+            execute_body = None
+
+        clauses.append((kind, execute_test, execute_body))
+
+    def execute(environment):
+        for kind, execute_test, execute_body in clauses:
+            if kind == 'else':
+                return execute_body(environment)
+
+            condition = execute_test(environment)
+
+            # everything except an explicit false boolean is true
+            if condition is FALSE:
+                continue
+
+            if kind == '=>':
+                receiver = execute_body(environment)
+
+                if not isinstance(receiver, Function):
+                    raise SchemeTypeError("You can only call functions, but "
+                                          "you gave me a %s." % receiver.__class__)
+
+                if tail and not isinstance(receiver, BuiltInFunction):
+                    return TailCall(receiver, [condition])
+
+                return call_function(receiver, [condition])
+
+            if execute_body is None:
+                return condition
+
+            return execute_body(environment)
+
+        return None
+
+    return execute
+
+
+@define_primitive('and')
+def and_function(arguments, scope, tail):
+    """Evaluate the arguments from left to right, stopping at the first
+    false value. Returns the last value evaluated, or #t if there are
+    no arguments.
+
+    """
+    if not arguments:
+        return lambda environment: TRUE
+
+    arguments = list(arguments)
+    leading = [analyse(argument, scope) for argument in arguments[:-1]]
+    last = analyse(arguments[-1], scope, tail)
+
+    def execute(environment):
+        for execute_argument in leading:
+            value = execute_argument(environment)
+
+            if value is FALSE:
+                return value
+
+        return last(environment)
+
+    return execute
+
+
+@define_primitive('or')
+def or_function(arguments, scope, tail):
+    """Evaluate the arguments from left to right, stopping at the first
+    true value. Returns the last value evaluated, or #f if there are
+    no arguments.
+
+    """
+    if not arguments:
+        return lambda environment: FALSE
+
+    arguments = list(arguments)
+    leading = [analyse(argument, scope) for argument in arguments[:-1]]
+    last = analyse(arguments[-1], scope, tail)
+
+    def execute(environment):
+        for execute_argument in leading:
+            value = execute_argument(environment)
+
+            if value is not FALSE:
+                return value
+
+        return last(environment)
+
+    return execute
 
 
 @define_primitive('quasiquote')
-def quasiquote(arguments, environment):
+def quasiquote(arguments, scope, tail):
     """Returns the arguments unevaluated, except for any occurrences
     of unquote.
 
     """
-    def recursive_eval_unquote(s_expression, _environment):
-        """Return a copy of s_expression, with all occurrences of
-        unquoted s-expressions replaced by their evaluated values.
+    def analyse_unquote(s_expression):
+        """Return a function that builds a copy of s_expression, with all
+        occurrences of unquoted s-expressions replaced by their
+        evaluated values.
 
         Note that we can only have unquote-splicing in a sublist,
         since we can only return one value, e.g `,@(1 2 3).
 
         """
         if isinstance(s_expression, Atom):
-            return (s_expression, _environment)
+            return lambda environment: s_expression
 
-        elif isinstance(s_expression, Nil):
-            return (s_expression, _environment)
+        elif s_expression is NIL:
+            return lambda environment: s_expression
 
-        elif s_expression[0] == Symbol("unquote"):
-            check_argument_number('unquote', arguments, 1, 1)
-            return eval_s_expression(s_expression[1], _environment)
+        elif s_expression[0] is Symbol("unquote"):
+            check_argument_number('unquote', s_expression.tail, 1, 1)
+            return analyse(s_expression[1], scope)
 
-        else:
-            # return a list of s_expressions that have been
-            # recursively checked for unquote
-            list_elements = []
+        # build a list of s_expressions that have been recursively
+        # checked for unquote, noting which ones we splice in
+        element_builders = []
 
-            for element in s_expression:
-                if isinstance(element, Cons) and \
-                        element[0] == Symbol('unquote-splicing'):
-                    check_argument_number('unquote-splicing', element.tail, 1, 1)
+        for element in s_expression:
+            if isinstance(element, Cons) and \
+                    element[0] is Symbol('unquote-splicing'):
+                check_argument_number('unquote-splicing', element.tail, 1, 1)
+                element_builders.append((True, analyse(element[1], scope)))
+            else:
+                element_builders.append((False, analyse_unquote(element)))
 
-                    (result, _environment) = eval_s_expression(element[1], _environment)
+        def execute(environment):
+            list_elements = []
+
+            for (is_spliced, execute_element) in element_builders:
+                result = execute_element(environment)
 
-                    if not isinstance(result, Cons) and not isinstance(result, Nil):
+                if is_spliced:
+                    if not isinstance(result, Cons) and result is not NIL:
                         raise SchemeArityError("unquote-splicing requires a list.")
 
                     for item in result:
                         list_elements.append(item)
-                        
                 else:
-                    (result, _environment) = recursive_eval_unquote(element, _environment)
                     list_elements.append(result)
 
-            return (Cons.from_list(list_elements), _environment)
+            return Cons.from_list(list_elements)
+
+        return execute
 
     check_argument_number('quasiquote', arguments, 1, 1)
 
-    return recursive_eval_unquote(arguments[0], environment)
+    return analyse_unquote(arguments[0])
 
 
 @define_primitive('defmacro')
-def defmacro(arguments, environment):
+def defmacro(arguments, scope, tail):
     """defmacro is a restricted version of Common Lisp's defmacro:
     http://www.ai.mit.edu/projects/iiip/doc/CommonLISP/HyperSpec/Body/mac_defmacro.html
 
@@ -362,45 +738,40 @@ def defmacro(arguments, environment):
     else:
         macro_arguments = raw_macro_arguments
         is_variadic = False
-    
-    replacement_body = arguments[2]
 
-    def expand_then_eval(arguments, _environment):
-        """Expand this macro once, then continue evaluation."""
-        if is_variadic:
-            if len(arguments) < len(macro_arguments):
-                raise SchemeArityError("Macro %s takes at least %d arguments, but got %d."
-                                       % (macro_name, len(macro_arguments),
-                                          len(arguments)))
-
-        else:
-            if len(arguments) != len(macro_arguments):
-                raise SchemeArityError("Macro %s takes %d arguments, but got %d."
-                                       % (macro_name, len(macro_arguments),
-                                          len(arguments)))
+    if is_variadic:
+        macro_scope = Scope(macro_arguments + [variadic_argument_name], scope)
+    else:
+        macro_scope = Scope(macro_arguments, scope)
 
-        new_environment = dict(_environment)
-        for (variable_name, variable_value) in zip(macro_arguments, arguments):
-            new_environment[variable_name] = variable_value
+    execute_replacement_body = analyse(arguments[2], macro_scope)
+    define_in_frame = analyse_definition(macro_name, scope, False)
 
-        if is_variadic:
-            remaining_arguments = []
-            for index, arg in enumerate(arguments):
-                if index >= len(macro_arguments):
-                    remaining_arguments.append(arg)
+    def execute(environment):
+        def expand(arguments):
+            """Expand this macro once, returning the new s-expression."""
+            if is_variadic:
+                if len(arguments) < len(macro_arguments):
+                    raise SchemeArityError("Macro %s takes at least %d arguments, but got %d."
+                                           % (macro_name, len(macro_arguments),
+                                              len(arguments)))
 
-            new_environment[variadic_argument_name] = Cons.from_list(remaining_arguments)
+            else:
+                if len(arguments) != len(macro_arguments):
+                    raise SchemeArityError("Macro %s takes %d arguments, but got %d."
+                                           % (macro_name, len(macro_arguments),
+                                              len(arguments)))
 
-        (s_expression_after_expansion, new_environment) = eval_s_expression(replacement_body, new_environment)
+            # the macro body is evaluated in the environment the macro was
+            # defined in
+            elements = arguments.to_list()
+            values = elements[:len(macro_arguments)]
 
-        # restore old environment, ignoring variables hidden by scope
-        for variable_name in _environment:
-            if variable_name not in macro_arguments:
-                _environment[variable_name] = new_environment[variable_name]
+            if is_variadic:
+                values.append(Cons.from_list(elements[len(macro_arguments):]))
 
-        # continue evaluation where we left off
-        return eval_s_expression(s_expression_after_expansion, _environment)
+            return execute_replacement_body(Frame(values, environment))
 
-    environment[macro_name] = expand_then_eval
+        define_in_frame(environment, Macro(expand, macro_name))
 
-    return (None, environment)
+    return execute
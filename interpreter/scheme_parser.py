@@ -1,111 +1,178 @@
-import ply.yacc
+"""The reader for our minimal scheme. We split the program into tokens
+with a single regular expression, and build lists with an explicit
+stack rather than recursing, so long programs and deeply nested lists
+don't use any Python stack.
 
-from lexer import tokens
-from data_types import (Cons, Nil, Symbol, Integer, FloatingPoint, Boolean,
-                        Character, String)
-from errors import SchemeSyntaxError
-
-"""Grammar for our minimal scheme:
+The syntax is:
 
 # a program is a series of s-expressions
-program : sexpression program
-        |
+program : sexpression*
 
-# an s-expression is a list or an atom
 sexpression : atom
-            | list
+            | ( sexpression* )
+            | ' sexpression
+            | ` sexpression
+            | , sexpression
+            | ,@ sexpression
 
-# unlike a normal list, using ' only permits one argument
-list : ( listarguments )
-     | QUOTESUGAR sexpression
-     | QUASIQUOTESUGAR sexpression
-     | UNQUOTESUGAR sexpression
-     | UNQUOTESPLICINGSUGAR sexpression
+atom : SYMBOL | INTEGER | FLOATING_POINT | BOOLEAN | CHARACTER | STRING
 
-listarguments : sexpression listarguments
-              |
-
-atom : SYMBOL | NUMBER | BOOLEAN | CHARACTER | STRING
+'foo is read as (quote foo), and similarly for quasiquote, unquote
+and unquote-splicing. There's no syntax for dotted pairs, so (a . b)
+is a list of three symbols (define and lambda look for the . symbol
+in their parameters).
 
 """
+import re
 
-# now, parse an expression and build a parse tree:
-
-def p_program(p):
-    "program : sexpression program"
-    p[0] = Cons(p[1], p[2])
-
-def p_program_empty(p):
-    "program :"
-    p[0] = Nil()
-
-def p_sexpression_atom(p):
-    "sexpression : atom"
-    p[0] = p[1]
-
-def p_sexpression_list(p):
-    "sexpression : list"
-    p[0] = p[1]
-
-def p_list(p):
-    "list : LPAREN listarguments RPAREN"
-    p[0] = p[2]
-
-def p_list_quotesugar(p):
-    "list : QUOTESUGAR sexpression"
-    # convert 'foo to (quote foo)
-    p[0] = Cons(Symbol("quote"), Cons(p[2]))
-
-def p_list_quasiquotesugar(p):
-    "list : QUASIQUOTESUGAR sexpression"
-    # convert `foo to (quasiquote foo)
-    p[0] = Cons(Symbol("quasiquote"), Cons(p[2]))
-
-def p_list_unquotesugar(p):
-    "list : UNQUOTESUGAR sexpression"
-    # convert ,foo to (unquote foo)
-    p[0] = Cons(Symbol("unquote"), Cons(p[2]))
-
-def p_list_unquotesplicingsugar(p):
-    "list : UNQUOTESPLICINGSUGAR sexpression"
-    # convert ,foo to (unquote foo)
-    p[0] = Cons(Symbol("unquote-splicing"), Cons(p[2]))
-
-def p_listarguments_one(p):
-    "listarguments : sexpression listarguments"
-    # a list is therefore a nested tuple:
-    p[0] = Cons(p[1], p[2])
-
-def p_listargument_empty(p):
-    "listarguments :"
-    p[0] = Nil()
-
-def p_atom_symbol(p):
-    "atom : SYMBOL"
-    p[0] = Symbol(p[1])
-
-def p_atom_number(p):
-    "atom : INTEGER"
-    p[0] = Integer(p[1])
-
-def p_atom_floating_point(p):
-    "atom : FLOATING_POINT"
-    p[0] = FloatingPoint(p[1])
+from data_types import (Cons, Symbol, Integer, FloatingPoint, Boolean,
+                        Character, String)
+from errors import SchemeSyntaxError
 
-def p_atom_boolean(p):
-    "atom : BOOLEAN"
-    p[0] = Boolean(p[1])
+# every atom must be followed by whitespace, a paren, a quote, a
+# string, a comment or the end of the program
+DELIMITER = r"""(?=[\s()'`,";]|\Z)"""
 
-def p_atom_character(p):
-    "atom : CHARACTER"
-    p[0] = Character(p[1])
+# each match is a token, along with any whitespace and comments before it
+TOKEN = re.compile(r"""
+  (?:\s+|;[^\n]*)*
+  (?:
+    (?P<LPAREN>\()
+  | (?P<RPAREN>\))
+  | (?P<FLOATING_POINT>-?(?:[0-9]*\.[0-9]+|[0-9]+\.[0-9]*)%(delimiter)s)
+  | (?P<INTEGER>-?[0-9]+%(delimiter)s)
+  | (?P<SYMBOL>[a-zA-Z!$%%&*+./:<=>?@^_~-][0-9a-zA-Z!$%%&*+./:<=>?@^_~-]*%(delimiter)s)
+  | (?P<STRING>"(?:[^"\\]|\\.)*")
+  | (?P<BOOLEAN>\#[tf]%(delimiter)s)
+  | (?P<CHARACTER>\#\\(?:space|newline|.)%(delimiter)s)
+  | (?P<QUOTESUGAR>')
+  | (?P<QUASIQUOTESUGAR>`)
+  | (?P<UNQUOTESPLICINGSUGAR>,@)
+  | (?P<UNQUOTESUGAR>,)
+  | (?P<END>\Z)
+  )""" % {'delimiter': DELIMITER}, re.VERBOSE)
+
+SUGAR = {"QUOTESUGAR": Symbol("quote"),
+         "QUASIQUOTESUGAR": Symbol("quasiquote"),
+         "UNQUOTESUGAR": Symbol("unquote"),
+         "UNQUOTESPLICINGSUGAR": Symbol("unquote-splicing")}
+
+CHARACTER_NAMES = {'space': ' ', 'newline': '\n'}
+
+STRING_ESCAPE = re.compile(r'\\(.)', re.DOTALL)
+STRING_ESCAPES = {'"': '"', '\\': '\\', 'n': '\n', 't': '\t'}
+
+
+def unescape(match):
+    character = match.group(1)
+
+    if character not in STRING_ESCAPES:
+        raise SchemeSyntaxError("Unknown escape in string: \\%s" % character)
+
+    return STRING_ESCAPES[character]
+
+
+def read_string(token):
+    # strip the leading and trailing doublequote
+    contents = token[1:-1]
+
+    if '\\' in contents:
+        contents = STRING_ESCAPE.sub(unescape, contents)
+
+    return String(contents)
+
+
+def read_forms(lines):
+    """Yield each top-level s-expression in turn, as soon as we've read
+    it. `lines` is an iterable of strings that each end at a line
+    break, such as an open file, so we never need the whole program in
+    memory at once.
+
+    `stack` holds a Python list of elements for every list we're in
+    the middle of reading, and the quote symbol for every ' (or `, ,
+    ,@) that is waiting for its s-expression.
+
+    """
+    stack = []
+    unread = ""
+
+    for line in lines:
+        unread = yield from read_tokens(unread + line, stack, False)
+
+    if unread:
+        yield from read_tokens(unread, stack, True)
+
+    if stack:
+        raise SchemeSyntaxError("Unexpected end of input: missing ')' or a "
+                                "quoted s-expression.")
+
+
+def read_tokens(text, stack, at_end):
+    """Read every token in text, yielding any top-level s-expressions we
+    finish. A string may continue on the next line, so unless we're
+    `at_end` of the program, we return the text of a string we haven't
+    finished, to read again with the next line.
+
+    """
+    scanner = TOKEN.scanner(text)
+    position = 0
+
+    while True:
+        match = scanner.match()
+
+        if match is None:
+            remainder = text[position:].lstrip()
+
+            if remainder.startswith('"') and not at_end:
+                return remainder
+
+            raise SchemeSyntaxError('Could not lex the remainder of input: "%s"'
+                                    % remainder[:20])
+
+        position = match.end()
+        kind = match.lastgroup
+
+        if kind == "SYMBOL":
+            s_expression = Symbol(match.group(kind))
+        elif kind == "LPAREN":
+            stack.append([])
+            continue
+        elif kind == "RPAREN":
+            if not stack or type(stack[-1]) is not list:
+                raise SchemeSyntaxError("Unexpected ')'.")
+
+            s_expression = Cons.from_list(stack.pop())
+        elif kind == "INTEGER":
+            s_expression = Integer(match.group(kind))
+        elif kind == "FLOATING_POINT":
+            s_expression = FloatingPoint(match.group(kind))
+        elif kind == "STRING":
+            s_expression = read_string(match.group(kind))
+        elif kind == "BOOLEAN":
+            s_expression = Boolean(match.group(kind) == "#t")
+        elif kind == "CHARACTER":
+            name = match.group(kind)[2:]
+            s_expression = Character(CHARACTER_NAMES.get(name, name))
+        elif kind == "END":
+            return ""
+        else:
+            # a quote applies to the next s-expression we read
+            stack.append(SUGAR[kind])
+            continue
 
-def p_atom_string(p):
-    "atom : STRING"
-    p[0] = String(p[1])
+        # convert 'foo to (quote foo) etc
+        while stack and type(stack[-1]) is Symbol:
+            s_expression = Cons(stack.pop(), Cons(s_expression))
 
-def p_error(p):
-    raise SchemeSyntaxError("Parse error.")
+        if stack:
+            stack[-1].append(s_expression)
+        else:
+            yield s_expression
 
 
-parser = ply.yacc.yacc()
+def parse(program):
+    """Return a linked list of every top-level s-expression in the
+    string program.
+
+    """
+    return Cons.from_list(read_forms([program]))
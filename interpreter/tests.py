@@ -4,21 +4,33 @@ import unittest
 import sys
 from io import StringIO
 
-from evaluator import eval_program, load_standard_library, load_built_ins
+from evaluator import (eval_program, eval_file, load_standard_library, load_built_ins,
+                       macro_expansion_counts, engines)
+from expander import expand_program
+from writer import write
+from scheme_parser import parse, read_forms
+from environment import Environment
 from errors import (SchemeTypeError, SchemeStackOverflow, SchemeSyntaxError,
-                    SchemeArityError)
+                    SchemeArityError, UndefinedVariable, CircularList,
+                    InvalidArgument)
 from data_types import (Vector, Cons, Nil, Integer, Boolean, String,
-                        Character, FloatingPoint)
+                        Character, FloatingPoint, Symbol, NIL, TRUE, FALSE,
+                        get_external_representation, is_equal)
 
 
 class InterpreterTest(unittest.TestCase):
+    engine = 'analyser'
+    pure_scheme = False
+
     def setUp(self):
-        self.environment = {}
+        self.environment = Environment()
         self.environment = load_built_ins(self.environment)
-        self.environment = load_standard_library(self.environment)
+        self.environment = load_standard_library(self.environment, self.engine,
+                                                 self.pure_scheme)
 
     def evaluate(self, program):
-        internal_result, final_environment = eval_program(program, self.environment)
+        internal_result, final_environment = eval_program(program, self.environment,
+                                                          self.engine)
         return internal_result
 
     def assertEvaluatesTo(self, program, expected_result):
@@ -74,13 +86,87 @@ class LexerTest(InterpreterTest):
 
     def test_invalid(self):
         program = '\\y'
-        self.assertRaises(SchemeSyntaxError, eval_program, program, None)
+        self.assertRaises(SchemeSyntaxError, eval_program, program, None, self.engine)
 
 
 class ParserTest(InterpreterTest):
     def test_mismatched_parens(self):
         program = "("
-        self.assertRaises(SchemeSyntaxError, eval_program, program, None)
+        self.assertRaises(SchemeSyntaxError, eval_program, program, None, self.engine)
+
+        program = "())"
+        self.assertRaises(SchemeSyntaxError, eval_program, program, None, self.engine)
+
+        program = "(')"
+        self.assertRaises(SchemeSyntaxError, eval_program, program, None, self.engine)
+
+    def test_quote_sugar(self):
+        program = "''(a `(b ,c ,@d))"
+        self.assertEvaluatesTo(program, parse("(quote (a (quasiquote (b (unquote c) (unquote-splicing d)))))")[0])
+
+    def test_comments(self):
+        program = "; a comment\n(+ 1 ; another comment\n 2)"
+        self.assertEvaluatesTo(program, Integer(3))
+
+    def test_deep_nesting(self):
+        # the reader doesn't recurse, so this doesn't use the Python stack
+        s_expressions = parse("(" * 100000 + ")" * 100000)
+
+        nested = NIL
+        for i in range(99999):
+            nested = Cons(nested)
+
+        self.assertEqual(s_expressions, Cons(nested))
+
+    def test_string_characters(self):
+        program = '"x = 1; (y)"'
+        self.assertEvaluatesTo(program, String('x = 1; (y)'))
+
+        program = '"\\q"'
+        self.assertRaises(SchemeSyntaxError, eval_program, program, None, self.engine)
+
+    def test_atoms_need_delimiters(self):
+        program = "1abc"
+        self.assertRaises(SchemeSyntaxError, eval_program, program, None, self.engine)
+
+    def test_read_lines(self):
+        lines = ['(define s "a\n', 'b") (define\n', ' x 1) \'(1\n', '2)']
+        s_expressions = list(read_forms(lines))
+
+        self.assertEqual(s_expressions, list(parse("".join(lines))))
+        self.assertEqual(s_expressions[0][2], String("a\nb"))
+
+    def test_read_lazily(self):
+        lines_read = []
+
+        def lines():
+            for line in ["(a)\n", "(b\n", ")\n"]:
+                lines_read.append(line)
+                yield line
+
+        s_expressions = read_forms(lines())
+
+        self.assertEqual(next(s_expressions), parse("(a)")[0])
+        self.assertEqual(len(lines_read), 1)
+
+    def test_unterminated_string(self):
+        self.assertRaises(SchemeSyntaxError, list, read_forms(['"abc\n', 'def']))
+
+
+class EvalFileTest(InterpreterTest):
+    def test_eval_file(self):
+        program_file = StringIO("(define x 1)\n(define y (+ x 1))\ny\n")
+        result, environment = eval_file(program_file, self.environment, self.engine)
+
+        self.assertEqual(result, Integer(2))
+
+    def test_evaluated_before_syntax_error(self):
+        # we evaluate each s-expression as soon as we've read it
+        program_file = StringIO("(define x 1)\n)")
+
+        self.assertRaises(SchemeSyntaxError, eval_file, program_file,
+                          self.environment, self.engine)
+        self.assertEvaluatesTo("x", Integer(1))
 
 
 class EvaluatorTest(InterpreterTest):
@@ -169,16 +255,128 @@ class EvaluatorTest(InterpreterTest):
 
     def test_type_error(self):
         program = "(2 2)"
-        self.assertRaises(SchemeTypeError, eval_program, program, None)
+        self.assertRaises(SchemeTypeError, eval_program, program, None, self.engine)
 
     def test_stack_overflow(self):
-        # FIXME: with TCO, this is actually just an infinite loop
-        program = "(define (f) (f)) (f)"
-        self.assertRaises(SchemeStackOverflow, eval_program, program, None)
+        # (define (f) (f)) would just loop forever, since (f) is a tail call
+        program = "(define (f) (begin (f) 1)) (f)"
+        self.assertRaises(SchemeStackOverflow, eval_program, program, None, self.engine)
+
+    def test_deeply_nested_code(self):
+        # expanding this recurses too deeply, before we evaluate it
+        program = "(+ 1 " * 3000 + "0" + ")" * 3000
+        self.assertRaises(SchemeStackOverflow, eval_program, program, None, self.engine)
+
+    def test_tail_call(self):
+        program = """(define (count-down n)
+                         (if (= n 0) 'done (count-down (- n 1))))
+                     (count-down 5000)"""
+        self.assertEvaluatesTo(program, Symbol('done'))
+
+    def test_tail_call_lambda(self):
+        program = """(define count-down
+                       (lambda (n) (if (= n 0) 'done (count-down (- n 1)))))
+                     (count-down 5000)"""
+        self.assertEvaluatesTo(program, Symbol('done'))
+
+    def test_tail_call_begin_and_macro(self):
+        program = """(define (count-down n)
+                       (begin
+                         (cond ((= n 0) 'done)
+                               (else (count-down (- n 1))))))
+                     (count-down 1000)"""
+        self.assertEvaluatesTo(program, Symbol('done'))
+
+    def test_tail_call_updates_globals(self):
+        program = """(define total 0)
+                     (define (add-up n)
+                       (if (= n 0)
+                           (set! total (+ total 1))
+                           (begin (set! total (+ total n))
+                                  (add-up (- n 1)))))
+                     (add-up 100)
+                     total"""
+        self.assertEvaluatesTo(program, Integer(5051))
+
+    def test_tail_call_masked_globals(self):
+        # n is a global, but masked by the parameter of f
+        program = """(define n 1)
+                     (define (g) (set! n (+ n 10)))
+                     (define (f n) (g))
+                     (f 5)
+                     n"""
+        self.assertEvaluatesTo(program, Integer(11))
+
+    def test_closure(self):
+        program = """(define (make-counter)
+                       ((lambda (count)
+                          (lambda () (set! count (+ count 1)) count))
+                        0))
+                     (define counter (make-counter))
+                     (counter)
+                     (counter)"""
+        self.assertEvaluatesTo(program, Integer(2))
+
+    def test_lexical_scope(self):
+        program = """(define x 1)
+                     (define (get-x) x)
+                     (define (f x) (get-x))
+                     (f 2)"""
+        self.assertEvaluatesTo(program, Integer(1))
+
+    def test_nested_define(self):
+        program = """(define (f)
+                       (define x 2)
+                       (define (double y) (* y x))
+                       (double 3))
+                     (f)"""
+        self.assertEvaluatesTo(program, Integer(6))
+
+    def test_nested_closure(self):
+        program = """(define (f x)
+                       (lambda (y)
+                         (lambda (z) (+ x y z))))
+                     (((f 1) 2) 3)"""
+        self.assertEvaluatesTo(program, Integer(6))
+
+    def test_global_defined_after_use(self):
+        program = "(define (f) (g)) (define (g) 1) (f)"
+        self.assertEvaluatesTo(program, Integer(1))
+
+    def test_undefined_variable(self):
+        program = "(define foo 1) fo"
+        with self.assertRaises(UndefinedVariable) as context:
+            self.evaluate(program)
+
+        self.assertIn('foo', context.exception.message)
+
+    def test_local_used_before_definition(self):
+        program = "(define (f) (define x y) (define y 1) x) (f)"
+        self.assertRaises(UndefinedVariable, self.evaluate, program)
+
+    def test_variadic_function_explicit_parameters(self):
+        program = "(define (f x . rest) (cons x rest)) (f 1 2 3)"
+        self.assertEvaluatesTo(program, Cons.from_list([Integer(1), Integer(2), Integer(3)]))
+
+    def test_no_parameters_extra_argument(self):
+        # extra arguments mustn't end up in the slots for internal definitions
+        program = "(define (f) (define x 5) x) (f 1)"
+        self.assertRaises(SchemeArityError, self.evaluate, program)
+
+        program = "((lambda () (define x 5) x) 1)"
+        self.assertRaises(SchemeArityError, self.evaluate, program)
+
+        program = "(define (g) (define x 5) x) (g)"
+        self.assertEvaluatesTo(program, Integer(5))
+
+    def test_syntax_checked_at_definition(self):
+        # the body of f is analysed when f is defined, not when it's called
+        program = "(define (f) (if #t))"
+        self.assertRaises(SchemeArityError, eval_program, program, None, self.engine)
 
     def test_call_empty_list(self):
         program = "()"
-        self.assertRaises(SchemeSyntaxError, eval_program, program, None)
+        self.assertRaises(SchemeSyntaxError, eval_program, program, None, self.engine)
 
     def test_quasiquote(self):
         program = "(quasiquote (1 1))"
@@ -201,6 +399,98 @@ class EvaluatorTest(InterpreterTest):
         self.assertEvaluatesTo(program, Cons.from_list([Integer(1), Integer(2), Integer(2)]))
 
 
+class SharedAtomTest(InterpreterTest):
+    """#t, #f and () are singletons, characters are cached and symbols
+    are interned, so atoms must never be modified.
+
+    """
+    def test_booleans(self):
+        self.assertIs(Boolean(True), TRUE)
+        self.assertIs(Boolean(False), FALSE)
+        self.assertIs(self.evaluate("(< 1 2)"), TRUE)
+        self.assertIs(self.evaluate("(not #t)"), FALSE)
+
+    def test_empty_list(self):
+        self.assertIs(Nil(), NIL)
+        self.assertIs(self.evaluate("'()"), NIL)
+        self.assertIs(self.evaluate("(cdr '(1))"), NIL)
+        self.assertIs(Vector(2)[1], NIL)
+
+    def test_characters(self):
+        self.assertIs(Character('a'), Character('a'))
+        self.assertIs(self.evaluate("#\\a"), Character('a'))
+
+    def test_symbols(self):
+        self.assertIs(Symbol('foo'), Symbol('foo'))
+        self.assertIs(self.evaluate("'foo"), Symbol('foo'))
+        self.assertIsNot(Symbol('foo'), Symbol('bar'))
+
+    def test_arithmetic_doesnt_mutate(self):
+        program = """(define zero 0)
+                     (+ zero 1) (- zero 1) (* zero 2) (+ zero 1.5)
+                     zero"""
+        self.assertEvaluatesTo(program, Integer(0))
+
+
+class NumberRepresentationTest(InterpreterTest):
+    """Numbers are plain Python ints and floats."""
+    def test_native_numbers(self):
+        self.assertIs(type(self.evaluate("(+ 2 3)")), int)
+        self.assertIs(type(self.evaluate("(* 2 1.5)")), float)
+        self.assertIs(type(self.evaluate("(quotient 7 2)")), int)
+
+    def test_predicates(self):
+        self.assertEvaluatesTo("(exact? 1)", Boolean(True))
+        self.assertEvaluatesTo("(inexact? 1.0)", Boolean(True))
+        self.assertEvaluatesTo("(number? #t)", Boolean(False))
+
+    def test_eqv(self):
+        self.assertEvaluatesTo("(eqv? 2 2)", Boolean(True))
+        self.assertEvaluatesTo("(eqv? 2 2.0)", Boolean(False))
+        self.assertEvaluatesTo("(= 2 2.0)", Boolean(True))
+
+    def test_external_representation(self):
+        result = self.evaluate("(list 1 2.5 (cons 3 4) (vector 5))")
+        self.assertEqual(get_external_representation(result),
+                         "(1 2.5 (3 . 4) #(5))")
+
+
+class WriterTest(InterpreterTest):
+    def assertWrites(self, program, expected_output):
+        output = StringIO()
+        write(self.evaluate(program), output)
+        self.assertEqual(output.getvalue(), expected_output)
+
+    def test_write(self):
+        program = "(list 1 '(2.5 #t) (vector 'a #\\b) '())"
+        self.assertWrites(program, "(1 (2.5 #t) #(a #\\b) ())")
+        self.assertWrites("(cons 1 2)", "(1 . 2)")
+        self.assertWrites("(vector)", "#()")
+
+    def test_shared_structure(self):
+        program = "(define x (list 1 2)) (list x x)"
+        self.assertWrites(program, "(#0=(1 2) #0#)")
+
+        program = "(define y (vector 1)) (vector y (list y))"
+        self.assertWrites(program, "#(#0=#(1) (#0#))")
+
+    def test_circular_structure(self):
+        program = "(define x (list 1 2)) (set-car! x x) x"
+        self.assertWrites(program, "#0=(#0# 2)")
+
+        program = "(define y (list 1 2)) (set-cdr! (cdr y) (cdr y)) y"
+        self.assertWrites(program, "(1 . #0=(2 . #0#))")
+
+    def test_deep_nesting(self):
+        nested = Nil()
+        for i in range(100000):
+            nested = Cons(nested)
+
+        output = StringIO()
+        write(nested, output)
+        self.assertEqual(output.getvalue(), "(" * 100000 + "()" + ")" * 100000)
+
+
 class EquivalenceTest(InterpreterTest):
     def test_eqv(self):
         program = "(eqv? 1 1)"
@@ -222,6 +512,62 @@ class EquivalenceTest(InterpreterTest):
         program = "(eq? (quote foo) (quote foo))"
         self.assertEvaluatesTo(program, Boolean(True))
 
+    def test_eqv_strings(self):
+        # strings are mutable, so two strings are different objects
+        program = '(eqv? "abc" "abc")'
+        self.assertEvaluatesTo(program, Boolean(False))
+
+        program = '(define s "abc") (eqv? s s)'
+        self.assertEvaluatesTo(program, Boolean(True))
+
+    def test_equal(self):
+        program = "(equal? (list 1 (vector 2 \"x\" #\\a)) (list 1 (vector 2 \"x\" #\\a)))"
+        self.assertEvaluatesTo(program, Boolean(True))
+
+        program = "(equal? (list 1 2) (list 1 2.0))"
+        self.assertEvaluatesTo(program, Boolean(False))
+
+        program = "(equal? (cons 1 2) (list 1 2))"
+        self.assertEvaluatesTo(program, Boolean(False))
+
+        program = "(equal? (vector 1 2) (vector 1))"
+        self.assertEvaluatesTo(program, Boolean(False))
+
+    def test_equal_deep_nesting(self):
+        first = NIL
+        second = NIL
+        for i in range(100000):
+            first = Cons(first)
+            second = Cons(second)
+
+        self.assertTrue(is_equal(first, second))
+        self.assertEqual(first, second)
+
+    def test_equal_long_lists(self):
+        first = Cons.from_list(range(100000))
+        second = Cons.from_list(range(100000))
+        self.assertTrue(is_equal(first, second))
+
+        second[99999] = 0
+        self.assertFalse(is_equal(first, second))
+
+    def test_equal_circular(self):
+        program = """(define x (list 1 2))
+                     (set-cdr! (cdr x) x)
+                     (define y (list 1 2 1 2))
+                     (set-cdr! (cdr (cdr (cdr y))) y)
+                     (define z (list 1 2 1 3))
+                     (set-cdr! (cdr (cdr (cdr z))) z)
+                     (list (equal? x y) (equal? x z))"""
+        self.assertEvaluatesTo(program, Cons.from_list([TRUE, FALSE]))
+
+        program = """(define a (list 1))
+                     (set-car! a a)
+                     (define b (list 1))
+                     (set-car! b b)
+                     (equal? a b)"""
+        self.assertEvaluatesTo(program, TRUE)
+
 
 class ListTest(InterpreterTest):
     def test_car(self):
@@ -282,6 +628,9 @@ class ListTest(InterpreterTest):
         program = "(list? 1)"
         self.assertEvaluatesTo(program, Boolean(False))
 
+        program = "(list? (cons 1 2))"
+        self.assertEvaluatesTo(program, Boolean(False))
+
     def test_list(self):
         program = "(list)"
         self.assertEvaluatesTo(program, Nil())
@@ -296,6 +645,49 @@ class ListTest(InterpreterTest):
         program = "(length (cons 2 (cons 3 '())))"
         self.assertEvaluatesTo(program, Integer(2))
 
+    def test_circular_list(self):
+        if self.pure_scheme:
+            self.skipTest("list? in library.scm doesn't handle circular lists")
+
+        program = "(define x (list 1 2 3)) (set-cdr! (cddr x) x) x"
+        result = self.evaluate(program)
+
+        self.assertEqual(get_external_representation(result), "#0=(1 2 3 . #0#)")
+        self.assertRaises(CircularList, len, result)
+        self.assertEvaluatesTo("(list? x)", Boolean(False))
+
+    def test_long_list_indexing(self):
+        long_list = Nil()
+        for i in reversed(range(10000)):
+            long_list = Cons(Integer(i), long_list)
+
+        self.assertEqual(len(long_list), 10000)
+        self.assertEqual(long_list[9999], Integer(9999))
+
+        long_list[9999] = Integer(0)
+        self.assertEqual(long_list[9999], Integer(0))
+
+    def test_long_list_conversion(self):
+        long_list = Cons.from_list(Integer(i) for i in range(100000))
+
+        self.assertEqual(len(long_list), 100000)
+        self.assertEqual(long_list.to_list(), list(range(100000)))
+        self.assertEqual(Cons.from_list([]), Nil())
+        self.assertEqual(Nil().to_list(), [])
+
+    def test_to_list_improper(self):
+        self.assertEqual(Cons(Integer(1), Integer(2)).to_list(), [Integer(1)])
+
+    def test_length_improper_list(self):
+        if self.pure_scheme:
+            self.skipTest("cdr in library.scm's length doesn't check types")
+
+        program = "(length (cons 1 2))"
+        self.assertRaises(SchemeTypeError, self.evaluate, program)
+
+        program = "(define x (list 1 2)) (set-cdr! (cdr x) x) (length x)"
+        self.assertRaises(SchemeTypeError, self.evaluate, program)
+
     def test_pair(self):
         program = "(pair? (quote (a b)))"
         self.assertEvaluatesTo(program, Boolean(True))
@@ -330,6 +722,23 @@ class ControlTest(InterpreterTest):
      total)"""
         self.assertEvaluatesTo(program, Integer(6))
 
+    def test_map_multiple_lists(self):
+        if self.pure_scheme:
+            self.skipTest("map in library.scm only takes one list")
+
+        program = "(map + '(1 2 3) '(10 20 30))"
+        self.assertEvaluatesTo(program, Cons.from_list([Integer(11), Integer(22), Integer(33)]))
+
+    def test_for_each_multiple_lists(self):
+        if self.pure_scheme:
+            self.skipTest("for-each in library.scm only takes one list")
+
+        program = """(define total 0)
+                     (for-each (lambda (x y) (set! total (+ total (* x y))))
+                               '(1 2) '(3 4))
+                     total"""
+        self.assertEvaluatesTo(program, Integer(11))
+
 
 class MathsTest(InterpreterTest):
     def test_addition(self):
@@ -625,6 +1034,65 @@ class StringTest(InterpreterTest):
         program = '(define s "abc") (string-set! s 0 #\z) s'
         self.assertEvaluatesTo(program, String('zbc'))
 
+    def test_string_equal(self):
+        program = '(string=? "abc" (string-copy "abc") "abc")'
+        self.assertEvaluatesTo(program, TRUE)
+
+        program = '(string=? "abc" "abd")'
+        self.assertEvaluatesTo(program, FALSE)
+
+    def test_string_set_make_string(self):
+        program = '(define s (make-string 3 #\\a)) (string-set! s 1 #\\b) s'
+        self.assertEvaluatesTo(program, String('aba'))
+
+    def test_string_set_out_of_range(self):
+        program = '(string-set! (make-string 2) 2 #\\a)'
+        with self.assertRaises(InvalidArgument):
+            self.evaluate(program)
+
+    def test_string_copy(self):
+        program = '(define s "abc") (define t (string-copy s)) (string-set! t 0 #\\z) s'
+        self.assertEvaluatesTo(program, String('abc'))
+
+        program = '(string-copy "abcde" 1 3)'
+        self.assertEvaluatesTo(program, String('bc'))
+
+    def test_substring(self):
+        program = '(substring "abcde" 1 4)'
+        self.assertEvaluatesTo(program, String('bcd'))
+
+        program = '(substring "abc" 2 1)'
+        with self.assertRaises(InvalidArgument):
+            self.evaluate(program)
+
+    def test_string_append(self):
+        program = '(string-append "foo" "" "bar")'
+        self.assertEvaluatesTo(program, String('foobar'))
+
+        program = '(string-append)'
+        self.assertEvaluatesTo(program, String(''))
+
+    def test_string_append_in_place(self):
+        program = '(define s (make-string 1 #\\a)) (string-append! s "bc" #\\d) (string-set! s 0 #\\z) s'
+        self.assertEvaluatesTo(program, String('zbcd'))
+
+    def test_string_append_to_itself(self):
+        program = '(define s (string-copy "ab")) (string-append! s s) (list s (string-length s))'
+        self.assertEvaluatesTo(program, Cons.from_list([String('abab'), 4]))
+
+    def test_string_to_list(self):
+        program = '(string->list "abc")'
+        self.assertEvaluatesTo(program, Cons.from_list([Character('a'), Character('b'),
+                                                        Character('c')]))
+
+        program = '(list->string (string->list "abc" 1))'
+        self.assertEvaluatesTo(program, String('bc'))
+
+    def test_list_to_string(self):
+        program = "(list->string '(1 2))"
+        with self.assertRaises(SchemeTypeError):
+            self.evaluate(program)
+
 
 class BooleanTest(InterpreterTest):
     def test_not(self):
@@ -713,6 +1181,135 @@ class VectorTest(InterpreterTest):
             Vector.from_list([Integer(5)]))
 
 
+class NumericVectorTest(InterpreterTest):
+    def test_make_vector(self):
+        program = "(s64vector->list (make-s64vector 3 7))"
+        self.assertEvaluatesTo(program, Cons.from_list([7, 7, 7]))
+
+        program = "(u8vector-length (make-u8vector 5))"
+        self.assertEvaluatesTo(program, Integer(5))
+
+    def test_ref_and_set(self):
+        program = """(define v (f64vector 1 2.5))
+                     (f64vector-set! v 0 3)
+                     (f64vector-ref v 0)"""
+        self.assertEvaluatesTo(program, FloatingPoint(3.0))
+
+        program = "(s8vector-ref (s8vector 1 2) 2)"
+        self.assertRaises(InvalidArgument, self.evaluate, program)
+
+        program = "(s8vector-ref (s8vector 1 2) -1)"
+        self.assertRaises(InvalidArgument, self.evaluate, program)
+
+    def test_storage(self):
+        vector = self.evaluate("(list->u16vector '(1 2 3))")
+        self.assertEqual(vector.value.typecode, 'H')
+        self.assertEqual(get_external_representation(vector), "#u16(1 2 3)")
+
+    def test_range_and_type_checks(self):
+        self.assertRaises(InvalidArgument, self.evaluate, "(u8vector 256)")
+        self.assertRaises(InvalidArgument, self.evaluate, "(u8vector -1)")
+        self.assertRaises(SchemeTypeError, self.evaluate, "(s32vector 1.5)")
+        self.assertRaises(SchemeTypeError, self.evaluate, "(f32vector #t)")
+
+        program = "(define v (u8vector 1)) (u8vector-set! v 0 300)"
+        self.assertRaises(InvalidArgument, self.evaluate, program)
+
+    def test_predicates(self):
+        self.assertEvaluatesTo("(s64vector? (s64vector))", Boolean(True))
+        self.assertEvaluatesTo("(s64vector? (u64vector))", Boolean(False))
+        self.assertEvaluatesTo("(s64vector? (vector))", Boolean(False))
+
+    def test_generic_vector_conversion(self):
+        program = "(vector->list (f64vector->vector (vector->f64vector (vector 1 2))))"
+        self.assertEvaluatesTo(program, Cons.from_list([1.0, 2.0]))
+
+
+class HashTableTest(InterpreterTest):
+    def test_set_and_ref(self):
+        program = """(define t (make-hash-table))
+                     (hash-table-set! t 'a 1)
+                     (hash-table-set! t 'a 2)
+                     (list (hash-table-ref t 'a) (hash-table-size t))"""
+        self.assertEvaluatesTo(program, Cons.from_list([2, 1]))
+
+    def test_missing_key(self):
+        program = "(hash-table-ref (make-hash-table) 'a)"
+        with self.assertRaises(InvalidArgument) as context:
+            self.evaluate(program)
+
+        self.assertEqual(context.exception.message,
+                         "hash-table-ref: the hash table has no key a.")
+
+        program = "(hash-table-ref (make-hash-table) 'a (lambda () 3))"
+        self.assertEvaluatesTo(program, Integer(3))
+
+        program = "(hash-table-ref/default (make-hash-table) 'a 4)"
+        self.assertEvaluatesTo(program, Integer(4))
+
+    def test_delete(self):
+        program = """(define t (make-hash-table))
+                     (hash-table-set! t 'a 1)
+                     (hash-table-delete! t 'a)
+                     (hash-table-delete! t 'b)
+                     (list (hash-table-exists? t 'a) (hash-table-size t))"""
+        self.assertEvaluatesTo(program, Cons.from_list([FALSE, 0]))
+
+    def test_update(self):
+        program = """(define t (make-hash-table))
+                     (hash-table-update!/default t 'a (lambda (x) (+ x 1)) 0)
+                     (hash-table-update! t 'a (lambda (x) (* x 10)))
+                     (hash-table-update! t 'b (lambda (x) (+ x 1)) (lambda () 5))
+                     (list (hash-table-ref t 'a) (hash-table-ref t 'b))"""
+        self.assertEvaluatesTo(program, Cons.from_list([10, 6]))
+
+    def test_walk(self):
+        program = """(define t (make-hash-table))
+                     (define total 0)
+                     (hash-table-set! t 1 2)
+                     (hash-table-set! t 3 4)
+                     (hash-table-walk t (lambda (key value)
+                                          (set! total (+ total (* key value)))))
+                     total"""
+        self.assertEvaluatesTo(program, Integer(14))
+
+    def test_equal_keys(self):
+        program = """(define t (make-hash-table))
+                     (hash-table-set! t (list 1 (vector 2 "x")) 'found)
+                     (hash-table-ref t (list 1 (vector 2 "x")))"""
+        self.assertEvaluatesTo(program, Symbol('found'))
+
+    def test_circular_key(self):
+        program = """(define x (list 1 2))
+                     (set-cdr! (cdr x) x)
+                     (define t (make-hash-table))
+                     (hash-table-set! t x 'found)
+                     (hash-table-ref t x)"""
+        self.assertEvaluatesTo(program, Symbol('found'))
+
+    def test_eqv_keys(self):
+        program = """(define t (make-hash-table eqv?))
+                     (hash-table-set! t (list 1) 'list)
+                     (hash-table-set! t 2 'integer)
+                     (list (hash-table-ref/default t (list 1) #f)
+                           (hash-table-ref/default t 2 #f)
+                           (hash-table-ref/default t 2.0 #f))"""
+        self.assertEvaluatesTo(program, Cons.from_list([FALSE, Symbol('integer'), FALSE]))
+
+    def test_string_keys(self):
+        program = """(define t (make-hash-table string=?))
+                     (hash-table-set! t (make-string 2 #\\a) 1)
+                     (hash-table-ref t "aa")"""
+        self.assertEvaluatesTo(program, Integer(1))
+
+        program = "(hash-table-set! (make-hash-table string=?) 'a 1)"
+        self.assertRaises(SchemeTypeError, self.evaluate, program)
+
+    def test_unsupported_equivalence(self):
+        program = "(make-hash-table (lambda (x y) #t))"
+        self.assertRaises(InvalidArgument, self.evaluate, program)
+
+
 class IOTest(InterpreterTest):
     def setUp(self):
         super().setUp()
@@ -726,44 +1323,289 @@ class IOTest(InterpreterTest):
 
     def test_display(self):
         program = '(display "hello")'
-        eval_program(program, self.environment)
+        eval_program(program, self.environment, self.engine)
 
         self.assertEqual(sys.stdout.getvalue(), "hello")
         
     def test_newline(self):
         program = '(newline)'
-        eval_program(program, self.environment)
+        eval_program(program, self.environment, self.engine)
 
         self.assertEqual(sys.stdout.getvalue(), "\n")
         
 
 class MacroTest(InterpreterTest):
-    """Test macro definition, but also test syntax defined in the
-    standard library using macros.
-    
-    """
+    """Test macro definition and expansion."""
     def test_defmacro(self):
         program = '(defmacro inc (argument) `(+ 1 ,argument)) (inc 5)'
         self.assertEvaluatesTo(program, Integer(6))
 
-    def test_let(self):
-        program = "(let ((x 1)) x)"
+    def test_macro_in_function_body(self):
+        program = """(defmacro inc (argument) `(+ 1 ,argument))
+                     (define (f x) (inc (inc x)))
+                     (f 1)
+                     (f 5)"""
+        self.assertEvaluatesTo(program, Integer(7))
+
+    def test_macro_expanded_once(self):
+        self.evaluate("(defmacro inc (argument) `(+ 1 ,argument))")
+
+        program = """(define (f x) (inc x))
+                     (f 0) (f 1) (f 2)"""
+
+        macro_expansion_counts['expanded'] = 0
+        self.assertEvaluatesTo(program, Integer(3))
+        self.assertEqual(macro_expansion_counts['expanded'], 1)
+
+    def test_runtime_macro_expansion_cached(self):
+        if self.engine == 'vm':
+            self.skipTest("the VM expands macros when it compiles a function")
+
+        # f is defined before inc, so (inc x) is expanded when f is called
+        self.evaluate("(define (f x) (inc x))")
+        self.evaluate("(defmacro inc (argument) `(+ 1 ,argument))")
+
+        macro_expansion_counts['expanded'] = 0
+        macro_expansion_counts['cached'] = 0
+        self.assertEvaluatesTo("(f 0) (f 1) (f 2) (f 3)", Integer(4))
+        self.assertEqual(macro_expansion_counts['expanded'], 1)
+        self.assertEqual(macro_expansion_counts['cached'], 3)
+
+    def test_macro_redefined(self):
+        if self.engine == 'vm':
+            self.skipTest("the VM expands macros when it compiles a function")
+
+        # f is defined before foo, so (foo) is expanded when f is called
+        program = """(define (f) (foo))
+                     (defmacro foo () 1)
+                     (f)
+                     (defmacro foo () 2)
+                     (f)"""
+        self.assertEvaluatesTo(program, Integer(2))
+
+    def test_macro_redefined_after_expansion(self):
+        # foo is defined before f, so (foo) is expanded when f is
+        # defined and redefining foo doesn't change f
+        program = """(defmacro foo () 1)
+                     (define (f) (foo))
+                     (f)
+                     (defmacro foo () 2)
+                     (f)"""
         self.assertEvaluatesTo(program, Integer(1))
 
-    def test_let_last_argument(self):
-        program = "(let ((x 1)) 2 x)"
+    def test_expand_program(self):
+        program = """(defmacro inc (argument) `(+ 1 ,argument))
+                     (define (f x) (inc x))
+                     '(inc 1)"""
+
+        s_expressions = expand_program(parse(program), self.environment,
+                                       engines[self.engine])
+        expanded = [s_expression.get_external_representation()
+                    for s_expression in s_expressions]
+
+        self.assertEqual(expanded, ["(defmacro inc (argument) (quasiquote (+ 1 (unquote argument))))",
+                                    "(define (f x) (+ 1 x))",
+                                    "(quote (inc 1))"])
+
+    def test_expand_program_lazily(self):
+        # we get the forms before an error
+        s_expressions = expand_program(parse("(define x 1) (car)"), self.environment,
+                                       engines[self.engine])
+
+        self.assertEqual(next(s_expressions), parse("(define x 1)")[0])
+        self.assertRaises(SchemeArityError, next, s_expressions)
+
+    def test_local_shadows_macro(self):
+        program = """(defmacro foo (x y) y)
+                     (define (f foo) (foo 1 2))
+                     (f +)"""
+        self.assertEvaluatesTo(program, Integer(3))
+
+
+class ControlFormTest(InterpreterTest):
+    def test_let_closure(self):
+        program = """(define (make-counter)
+                       (let ((count 0))
+                         (lambda () (set! count (+ count 1)) count)))
+                     (define counter (make-counter))
+                     (counter)
+                     (counter)"""
+        self.assertEvaluatesTo(program, Integer(2))
+
+    def test_let_tail_call(self):
+        program = """(define (count-down n)
+                       (let ((m (- n 1)))
+                         (if (= m 0) 'done (count-down m))))
+                     (count-down 5000)"""
+        self.assertEvaluatesTo(program, Symbol('done'))
+
+    def test_named_let(self):
+        program = """(let loop ((i 0) (total 0))
+                       (if (= i 10000)
+                           total
+                           (loop (+ i 1) (+ total i))))"""
+        self.assertEvaluatesTo(program, Integer(49995000))
+
+    def test_named_let_escapes(self):
+        program = """(define f (let loop ((i 0)) (if (= i 0) loop i)))
+                     (f 7)"""
+        self.assertEvaluatesTo(program, Integer(7))
+
+    def test_named_let_scope(self):
+        # the loop name isn't visible to the initial values
+        program = """(define loop 5)
+                     (let loop ((i loop)) i)"""
+        self.assertEvaluatesTo(program, Integer(5))
+
+    def test_do(self):
+        program = """(do ((i 0 (+ i 1))
+                          (total 0 (+ total i)))
+                         ((= i 10000) total))"""
+        self.assertEvaluatesTo(program, Integer(49995000))
+
+    def test_do_commands(self):
+        program = """(define v (make-vector 3))
+                     (do ((i 0 (+ i 1)))
+                         ((= i 3))
+                       (vector-set! v i (* i i)))
+                     v"""
+        self.assertEvaluatesAs(program, Vector.from_list([Integer(0), Integer(1), Integer(4)]))
+
+    def test_do_fresh_bindings(self):
+        # each iteration's closure sees its own i
+        program = """(define closures '())
+                     (do ((i 0 (+ i 1)))
+                         ((= i 2))
+                       (set! closures (cons (lambda () i) closures)))
+                     ((car closures))"""
         self.assertEvaluatesTo(program, Integer(1))
 
+    def test_do_invalid_binding(self):
+        program = "(do ((i)) (#t))"
+        self.assertRaises(SchemeSyntaxError, self.evaluate, program)
+
+        program = "(do ((i 0 1 2)) (#t))"
+        self.assertRaises(SchemeSyntaxError, self.evaluate, program)
+
     def test_cond(self):
-        program = "(cond ((else 1)))"
+        program = "(cond (else 1))"
         self.assertEvaluatesTo(program, Integer(1))
-    
-        program = "(define x 1) (cond (((> x 0) 3) (else 1)))"
+
+        program = "(define x 1) (cond ((> x 0) 3) (else 1))"
         self.assertEvaluatesTo(program, Integer(3))
-    
-        program = "(define y 1) (cond (((< y 0) 3) (else 1)))"
+
+        program = "(define y 1) (cond ((< y 0) 3) (else 1))"
         self.assertEvaluatesTo(program, Integer(1))
+
+    def test_cond_multiple_body_forms(self):
+        program = """(define x 0)
+                     (cond (#f 1) (#t (set! x 2) (+ x 1)))"""
+        self.assertEvaluatesTo(program, Integer(3))
+
+    def test_cond_test_only(self):
+        program = "(cond (#f 1) (2) (else 3))"
+        self.assertEvaluatesTo(program, Integer(2))
+
+    def test_cond_receiver(self):
+        program = "(cond ((car '(5)) => (lambda (x) (* x 2))) (else 3))"
+        self.assertEvaluatesTo(program, Integer(10))
+
+    def test_cond_no_match(self):
+        program = "(cond (#f 1))"
+        self.assertEvaluatesTo(program, None)
+
+    def test_cond_else_not_last(self):
+        program = "(cond (else 1) (#t 2))"
+        self.assertRaises(SchemeSyntaxError, self.evaluate, program)
+
+    def test_and_variadic(self):
+        program = "(and)"
+        self.assertEvaluatesTo(program, Boolean(True))
+
+        program = "(and 1 2 3)"
+        self.assertEvaluatesTo(program, Integer(3))
+
+        program = "(and 1 #f 3)"
+        self.assertEvaluatesTo(program, Boolean(False))
+
+    def test_or_variadic(self):
+        program = "(or)"
+        self.assertEvaluatesTo(program, Boolean(False))
+
+        program = "(or #f #f 3)"
+        self.assertEvaluatesTo(program, Integer(3))
+
+    def test_and_evaluates_once(self):
+        program = """(define count 0)
+                     (define (next) (set! count (+ count 1)) count)
+                     (and #t (next))
+                     count"""
+        self.assertEvaluatesTo(program, Integer(1))
+
+    def test_or_short_circuits(self):
+        program = """(define count 0)
+                     (or 1 (set! count 1))
+                     count"""
+        self.assertEvaluatesTo(program, Integer(0))
     
 
+# run every test again with the bytecode VM
+for test_case in list(InterpreterTest.__subclasses__()):
+    vm_test_case_name = 'VM' + test_case.__name__
+    globals()[vm_test_case_name] = type(vm_test_case_name, (test_case,), {'engine': 'vm'})
+
+
+# check the built-ins against the Scheme versions in library.scm
+for test_case in [ListTest, ControlTest, VectorTest]:
+    pure_scheme_test_case_name = 'PureScheme' + test_case.__name__
+    globals()[pure_scheme_test_case_name] = type(pure_scheme_test_case_name, (test_case,),
+                                                 {'pure_scheme': True})
+
+del test_case
+
+
+class DeepRecursionTest(InterpreterTest):
+    """The VM doesn't use the Python stack for calls, so non-tail
+    recursion can go much deeper.
+
+    """
+    engine = 'vm'
+
+    def setUp(self):
+        super().setUp()
+
+        # build the list with a tail call, so only the code under test recurses
+        self.evaluate("""(define (build-list n)
+                           (define (build-list-iter i result)
+                             (if (= i 0)
+                                 result
+                                 (build-list-iter (- i 1) (cons i result))))
+                           (build-list-iter n '()))""")
+
+    def test_deep_length(self):
+        program = "(length (build-list 100000))"
+        self.assertEvaluatesTo(program, Integer(100000))
+
+    def test_deep_map(self):
+        program = "(length (map (lambda (x) (* x 2)) (build-list 100000)))"
+        self.assertEvaluatesTo(program, Integer(100000))
+
+    def test_deep_user_recursion(self):
+        program = """(define (sum n)
+                       (if (= n 0)
+                           0
+                           (+ n (sum (- n 1)))))
+                     (sum 100000)"""
+        self.assertEvaluatesTo(program, Integer(5000050000))
+
+
+class PureSchemeDeepRecursionTest(DeepRecursionTest):
+    """The recursive versions of length and map in library.scm should
+    work on long lists too.
+
+    """
+    pure_scheme = True
+
+
 if __name__ == '__main__':
     unittest.main()
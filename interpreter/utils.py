@@ -4,12 +4,14 @@ def check_argument_number(function_name, given_arguments,
                           min_arguments, max_arguments=None):
     assert max_arguments is None or min_arguments <= max_arguments
 
+    # given_arguments may be a linked list, so we only find its length once
+    argument_number = len(given_arguments)
     right_argument_number = True
 
-    if len(given_arguments) < min_arguments:
+    if argument_number < min_arguments:
         right_argument_number = False
 
-    if max_arguments and len(given_arguments) > max_arguments:
+    if max_arguments is not None and argument_number > max_arguments:
         right_argument_number = False
 
     if not right_argument_number:
@@ -17,16 +19,16 @@ def check_argument_number(function_name, given_arguments,
             raise SchemeArityError("%s requires exactly %d argument(s), but "
                                   "received %d." % (function_name,
                                                     min_arguments,
-                                                    len(given_arguments)))
+                                                    argument_number))
         else:
-            if max_arguments:
+            if max_arguments is not None:
                 raise SchemeArityError("%s requires between %d and %d argument(s), but "
                                       "received %d." % (function_name,
                                                         min_arguments,
                                                         max_arguments,
-                                                        len(given_arguments)))
+                                                        argument_number))
             else:
                 raise SchemeArityError("%s requires at least %d argument(s), but "
                                       "received %d." % (function_name,
                                                         min_arguments,
-                                                        len(given_arguments)))
+                                                        argument_number))
@@ -0,0 +1,844 @@
+"""A bytecode virtual machine, as an alternative to executing analysed
+closures in evaluator.py.
+
+We compile each s-expression to a flat list of instructions: an opcode
+followed by its argument. The VM is a stack machine, and uses the
+same frames, scopes and global cells as the analyser, so functions
+created by one engine can be called by the other.
+
+Macros are expanded when we compile a macro use, so a macro must be
+defined by an earlier top-level form than the code that uses it. Any
+primitive we don't compile to instructions is analysed, and the VM
+executes the resulting closure.
+
+"""
+from data_types import (Atom, Symbol, Cons, TRUE, FALSE, Function, BuiltInFunction,
+                        UserFunction, LambdaFunction, Macro)
+from environment import Frame, Scope, UNASSIGNED
+from errors import (SchemeTypeError, SchemeSyntaxError, SchemeStackOverflow,
+                    RedefinedVariable, UndefinedVariable)
+from utils import check_argument_number
+from evaluator import (analyse, call_function, undefined_variable,
+                       macro_expansion_counts)
+from primitives import (primitives, function_scope, parse_let_bindings,
+                        parse_cond_clause, parse_do_bindings)
+from built_ins import built_ins
+
+
+# opcodes
+CONSTANT = 0
+LOAD_LOCAL = 1          # argument: index into the current frame
+LOAD_PARENT_LOCAL = 2   # argument: (depth, index)
+LOAD_GLOBAL = 3         # argument: cell
+SET_LOCAL = 4           # argument: (depth, index)
+SET_GLOBAL = 5          # argument: cell
+DEFINE_LOCAL = 6        # argument: (index, check redefinition)
+DEFINE_GLOBAL = 7       # argument: (cell, check redefinition)
+POP = 8
+JUMP = 9                # argument: instruction position
+JUMP_IF_FALSE = 10      # argument: instruction position
+MAKE_FUNCTION = 11      # argument: Code
+CALL = 12               # argument: number of arguments
+TAIL_CALL = 13          # argument: number of arguments
+RETURN = 14
+EXECUTE = 15            # argument: an analysed closure
+JUMP_IF_FALSE_OR_POP = 16  # argument: instruction position
+JUMP_IF_TRUE_OR_POP = 17   # argument: instruction position
+ENTER = 18              # argument: Code for the body of a let
+TAIL_ENTER = 19         # argument: Code for the body of a let
+LOOP = 20               # restart the current code in a new frame
+MAKE_LOOP = 21          # argument: Code for the body of a named let
+
+OPCODE_NAMES = ['CONSTANT', 'LOAD_LOCAL', 'LOAD_PARENT_LOCAL', 'LOAD_GLOBAL',
+                'SET_LOCAL', 'SET_GLOBAL', 'DEFINE_LOCAL', 'DEFINE_GLOBAL',
+                'POP', 'JUMP', 'JUMP_IF_FALSE', 'MAKE_FUNCTION', 'CALL',
+                'TAIL_CALL', 'RETURN', 'EXECUTE', 'JUMP_IF_FALSE_OR_POP',
+                'JUMP_IF_TRUE_OR_POP', 'ENTER', 'TAIL_ENTER', 'LOOP',
+                'MAKE_LOOP']
+
+
+class Code(object):
+    """A list of instructions, and the scope they run in. For the body
+    of a lambda or define, this is everything about the function
+    except the frame it closes over.
+
+    """
+    def __init__(self, scope, name=None, parameter_count=0, is_variadic=False,
+                 local_definitions=None):
+        self.scope = scope
+        self.instructions = []
+
+        self.name = name
+        self.parameter_count = parameter_count
+        self.is_variadic = is_variadic
+
+        # the initial values of the slots for local definitions
+        self.local_definitions = local_definitions
+
+
+def eval_s_expression(s_expression, environment):
+    try:
+        code = compile_top_level(s_expression, environment)
+        return (run(code, environment), environment)
+    except RecursionError:
+        raise SchemeStackOverflow()
+
+
+def compile_top_level(s_expression, environment):
+    code = Code(environment)
+    compile_s_expression(s_expression, environment, True, code.instructions)
+
+    return code
+
+
+def disassemble(code):
+    """Return a readable listing of code's instructions, for debugging."""
+    instructions = code.instructions
+    lines = []
+
+    for position in range(0, len(instructions), 2):
+        opcode = OPCODE_NAMES[instructions[position]]
+        argument = instructions[position + 1]
+
+        if argument is None:
+            lines.append("%4d %s" % (position, opcode))
+        else:
+            lines.append("%4d %s %r" % (position, opcode, argument))
+
+    return "\n".join(lines)
+
+
+def emit(instructions, opcode, argument=None):
+    instructions.append(opcode)
+    instructions.append(argument)
+
+
+def compile_s_expression(s_expression, scope, tail, instructions):
+    """Append instructions that push the value of s_expression onto the
+    stack. If `tail` is true, the instructions return from the current
+    function instead.
+
+    """
+    if isinstance(s_expression, Atom):
+        compile_atom(s_expression, scope, instructions)
+    else:
+        compile_list(s_expression, scope, tail, instructions)
+        if tail and instructions[-2] in (TAIL_CALL, TAIL_ENTER):
+            return
+
+    if tail:
+        emit(instructions, RETURN)
+
+
+def compile_body(s_expressions, scope, tail, instructions):
+    s_expressions = list(s_expressions)
+
+    if not s_expressions:
+        emit(instructions, CONSTANT, None)
+        if tail:
+            emit(instructions, RETURN)
+        return
+
+    for s_expression in s_expressions[:-1]:
+        compile_s_expression(s_expression, scope, False, instructions)
+        emit(instructions, POP)
+
+    compile_s_expression(s_expressions[-1], scope, tail, instructions)
+
+
+def compile_atom(atom, scope, instructions):
+    if not isinstance(atom, Symbol):
+        # with the exception of symbols, atoms evaluate to themselves
+        emit(instructions, CONSTANT, atom)
+        return
+
+    if atom.value in primitives:
+        raise SchemeSyntaxError("%s is a primitive, so it can't be used as a value."
+                                % atom.value)
+
+    address = scope.resolve(atom.value)
+
+    if address is None:
+        emit(instructions, LOAD_GLOBAL, scope.global_environment().cell(atom.value))
+    elif address[0] == 0:
+        emit(instructions, LOAD_LOCAL, address[1])
+    else:
+        emit(instructions, LOAD_PARENT_LOCAL, address)
+
+
+def compile_list(linked_list, scope, tail, instructions):
+    if not linked_list:
+        raise SchemeSyntaxError("() is not syntactically valid.")
+
+    operator = linked_list[0]
+
+    if isinstance(operator, Symbol):
+        if operator.value in compilers:
+            compilers[operator.value](linked_list.tail, scope, tail, instructions)
+            return
+
+        if operator.value in primitives:
+            # let the analyser handle it
+            emit(instructions, EXECUTE, analyse(linked_list, scope))
+            return
+
+        # expand macros now, so the expansion is compiled with the
+        # surrounding code
+        if scope.resolve(operator.value) is None:
+            value = scope.global_environment().cell(operator.value).value
+
+            if isinstance(value, Macro):
+                macro_expansion_counts['expanded'] += 1
+
+                s_expression_after_expansion = value(linked_list.tail)
+                compile_s_expression(s_expression_after_expansion, scope, tail, instructions)
+
+                # compile_s_expression has already returned, but our
+                # caller will add another RETURN, which is harmless
+                return
+
+    compile_s_expression(operator, scope, False, instructions)
+
+    argument_count = 0
+    for argument in linked_list.tail:
+        compile_s_expression(argument, scope, False, instructions)
+        argument_count += 1
+
+    if tail:
+        emit(instructions, TAIL_CALL, argument_count)
+    else:
+        emit(instructions, CALL, argument_count)
+
+
+compilers = {}
+
+# a decorator for compiling a primitive to instructions
+def define_compiler(primitive_name):
+    def define_compiler_decorator(function):
+        compilers[primitive_name] = function
+        return function
+
+    return define_compiler_decorator
+
+
+@define_compiler('quote')
+def compile_quote(arguments, scope, tail, instructions):
+    check_argument_number('quote', arguments, 1, 1)
+    emit(instructions, CONSTANT, arguments[0])
+
+
+@define_compiler('if')
+def compile_if(arguments, scope, tail, instructions):
+    check_argument_number('if', arguments, 2, 3)
+
+    compile_s_expression(arguments[0], scope, False, instructions)
+    emit(instructions, JUMP_IF_FALSE)
+    jump_to_else = len(instructions) - 1
+
+    compile_s_expression(arguments[1], scope, tail, instructions)
+
+    if not tail:
+        emit(instructions, JUMP)
+        jump_to_end = len(instructions) - 1
+
+    instructions[jump_to_else] = len(instructions)
+
+    if len(arguments) == 3:
+        compile_s_expression(arguments[2], scope, tail, instructions)
+    else:
+        emit(instructions, CONSTANT, None)
+        if tail:
+            emit(instructions, RETURN)
+
+    if not tail:
+        instructions[jump_to_end] = len(instructions)
+
+
+@define_compiler('begin')
+def compile_begin(arguments, scope, tail, instructions):
+    compile_body(arguments, scope, tail, instructions)
+
+
+@define_compiler('set!')
+def compile_set(arguments, scope, tail, instructions):
+    check_argument_number('set!', arguments, 2, 2)
+
+    variable_name = arguments[0]
+
+    if not isinstance(variable_name, Symbol):
+        raise SchemeTypeError("Tried to assign to a %s, which isn't a symbol." % variable_name.__class__)
+
+    compile_s_expression(arguments[1], scope, False, instructions)
+
+    address = scope.resolve(variable_name.value)
+
+    if address is None:
+        emit(instructions, SET_GLOBAL, scope.global_environment().cell(variable_name.value))
+    else:
+        emit(instructions, SET_LOCAL, address)
+
+
+def compile_definition(variable_name, scope, check_redefinition, instructions):
+    """Define the value on top of the stack as `variable_name`."""
+    if not isinstance(scope, Scope):
+        cell = scope.cell(variable_name)
+        emit(instructions, DEFINE_GLOBAL, (cell, check_redefinition))
+        return
+
+    if variable_name not in scope.names:
+        raise SchemeSyntaxError("Local definitions must be at the top level of "
+                                "a function body, but %s isn't." % variable_name)
+
+    index = scope.names.index(variable_name)
+    emit(instructions, DEFINE_LOCAL, (index, check_redefinition))
+
+
+def compile_function(name, parameter_names, is_variadic, body, scope, instructions):
+    body_scope = function_scope(parameter_names, body, scope)
+
+    local_definitions = [UNASSIGNED] * (len(body_scope.names) - len(parameter_names))
+
+    if is_variadic:
+        # the improper list parameter isn't counted
+        parameter_count = len(parameter_names) - 1
+    else:
+        parameter_count = len(parameter_names)
+
+    function_code = Code(body_scope, name, parameter_count, is_variadic,
+                         local_definitions)
+
+    compile_body(body, body_scope, True, function_code.instructions)
+
+    emit(instructions, MAKE_FUNCTION, function_code)
+
+
+@define_compiler('define')
+def compile_define(arguments, scope, tail, instructions):
+    check_argument_number('define', arguments, 2)
+
+    if isinstance(arguments[0], Atom):
+        if not isinstance(arguments[0], Symbol):
+            raise SchemeTypeError("Tried to assign to a %s, which isn't a symbol." % arguments[0].__class__)
+
+        compile_s_expression(arguments[1], scope, False, instructions)
+        compile_definition(arguments[0].value, scope, True, instructions)
+        return
+
+    function_name = arguments[0][0]
+
+    if not isinstance(function_name, Symbol):
+        raise SchemeTypeError("Function names must be symbols, not a %s." % function_name.__class__)
+
+    for parameter in arguments[0].tail:
+        if not isinstance(parameter, Symbol):
+            raise SchemeTypeError("Function arguments must be symbols, not a %s." % parameter.__class__)
+
+    parameter_names = [parameter.value for parameter in arguments[0].tail]
+    is_variadic = '.' in parameter_names
+
+    if is_variadic:
+        dot_position = parameter_names.index('.')
+
+        if parameter_names.count('.') > 1:
+            raise SchemeSyntaxError("May not have . more than once in a parameter list.")
+        if dot_position < len(parameter_names) - 2:
+            raise SchemeSyntaxError("You can only have one improper list "
+                                    "(you have %d parameters after the '.')." % (len(parameter_names) - 1 - dot_position))
+        if dot_position == len(parameter_names) - 1:
+            raise SchemeSyntaxError("Must name an improper list parameter after '.'.")
+
+        parameter_names.remove('.')
+
+    compile_function(function_name.value, parameter_names, is_variadic,
+                     arguments.tail, scope, instructions)
+    compile_definition(function_name.value, scope, False, instructions)
+
+
+@define_compiler('lambda')
+def compile_lambda(arguments, scope, tail, instructions):
+    check_argument_number('lambda', arguments, 2)
+
+    parameter_list = arguments[0]
+
+    if isinstance(parameter_list, Atom):
+        raise SchemeTypeError("The first argument to `lambda` must be a list of variables.")
+
+    for parameter in parameter_list:
+        if not isinstance(parameter, Symbol):
+            raise SchemeTypeError("Parameters of lambda functions must be symbols, not %s." % parameter.__class__)
+
+    parameter_names = [parameter.value for parameter in parameter_list]
+    compile_function(None, parameter_names, False, arguments.tail, scope, instructions)
+
+
+@define_compiler('let')
+def compile_let(arguments, scope, tail, instructions):
+    check_argument_number('let', arguments, 2)
+
+    if isinstance(arguments[0], Symbol):
+        compile_named_let(arguments, scope, tail, instructions)
+        return
+
+    names, value_s_expressions = parse_let_bindings(arguments[0])
+
+    for value in value_s_expressions:
+        compile_s_expression(value, scope, False, instructions)
+
+    body_scope = function_scope(names, arguments.tail, scope)
+    local_definitions = [UNASSIGNED] * (len(body_scope.names) - len(names))
+
+    # the body runs like a function body that takes the values as
+    # arguments, but there's no function object
+    body_code = Code(body_scope, 'let', len(names), False, local_definitions)
+    compile_body(arguments.tail, body_scope, True, body_code.instructions)
+
+    if tail:
+        emit(instructions, TAIL_ENTER, body_code)
+    else:
+        emit(instructions, ENTER, body_code)
+
+
+def compile_named_let(arguments, scope, tail, instructions):
+    """Compile a named let to a call to the loop function, which lives
+    in its own frame between the surrounding code and the loop body.
+
+    """
+    check_argument_number('let', arguments, 3)
+
+    loop_name = arguments[0].value
+    names, value_s_expressions = parse_let_bindings(arguments[1])
+
+    body = arguments.tail.tail
+    body_scope = function_scope(names, body, Scope([loop_name], scope))
+    local_definitions = [UNASSIGNED] * (len(body_scope.names) - len(names))
+
+    body_code = Code(body_scope, loop_name, len(names), False, local_definitions)
+    compile_body(body, body_scope, True, body_code.instructions)
+
+    emit(instructions, MAKE_LOOP, body_code)
+
+    for value in value_s_expressions:
+        compile_s_expression(value, scope, False, instructions)
+
+    if tail:
+        emit(instructions, TAIL_CALL, len(names))
+    else:
+        emit(instructions, CALL, len(names))
+
+
+@define_compiler('do')
+def compile_do(arguments, scope, tail, instructions):
+    """Compile a do loop to code that is entered like the body of a let.
+    Each iteration ends with a LOOP instruction, which restarts the
+    code with the new values of the variables.
+
+    """
+    check_argument_number('do', arguments, 2)
+
+    names, inits, steps = parse_do_bindings(arguments[0])
+    test_clause = arguments[1]
+
+    if isinstance(test_clause, Atom) or not test_clause:
+        raise SchemeSyntaxError("The second argument to `do` must be a list "
+                                "containing a test.")
+
+    for init in inits:
+        compile_s_expression(init, scope, False, instructions)
+
+    loop_scope = Scope(names, scope)
+    loop_code = Code(loop_scope, 'do', len(names), False, [])
+    loop_instructions = loop_code.instructions
+
+    compile_s_expression(test_clause[0], loop_scope, False, loop_instructions)
+    emit(loop_instructions, JUMP_IF_FALSE)
+    jump_to_commands = len(loop_instructions) - 1
+
+    compile_body(test_clause.tail, loop_scope, True, loop_instructions)
+
+    loop_instructions[jump_to_commands] = len(loop_instructions)
+
+    for command in arguments.tail.tail:
+        compile_s_expression(command, loop_scope, False, loop_instructions)
+        emit(loop_instructions, POP)
+
+    for step in steps:
+        compile_s_expression(step, loop_scope, False, loop_instructions)
+
+    emit(loop_instructions, LOOP)
+
+    if tail:
+        emit(instructions, TAIL_ENTER, loop_code)
+    else:
+        emit(instructions, ENTER, loop_code)
+
+
+def compile_short_circuit(arguments, scope, tail, instructions, jump_opcode, default):
+    """Compile `and` or `or`. We leave each value on the stack, and
+    jump to the end if it decides the result.
+
+    """
+    if not arguments:
+        emit(instructions, CONSTANT, default)
+        if tail:
+            emit(instructions, RETURN)
+        return
+
+    arguments = list(arguments)
+    jumps_to_end = []
+
+    for argument in arguments[:-1]:
+        compile_s_expression(argument, scope, False, instructions)
+        emit(instructions, jump_opcode)
+        jumps_to_end.append(len(instructions) - 1)
+
+    compile_s_expression(arguments[-1], scope, tail, instructions)
+
+    for jump in jumps_to_end:
+        instructions[jump] = len(instructions)
+
+    if tail:
+        emit(instructions, RETURN)
+
+
+@define_compiler('and')
+def compile_and(arguments, scope, tail, instructions):
+    compile_short_circuit(arguments, scope, tail, instructions,
+                          JUMP_IF_FALSE_OR_POP, TRUE)
+
+
+@define_compiler('or')
+def compile_or(arguments, scope, tail, instructions):
+    compile_short_circuit(arguments, scope, tail, instructions,
+                          JUMP_IF_TRUE_OR_POP, FALSE)
+
+
+@define_compiler('cond')
+def compile_cond(arguments, scope, tail, instructions):
+    clauses = [parse_cond_clause(clause) for clause in arguments]
+
+    if any(kind == '=>' for kind, test, body in clauses):
+        # let the analyser handle receivers
+        emit(instructions, EXECUTE, analyse(Cons(Symbol('cond'), arguments), scope))
+        if tail:
+            emit(instructions, RETURN)
+        return
+
+    jumps_to_end = []
+
+    for position, (kind, test, body) in enumerate(clauses):
+        if kind == 'else':
+            if position != len(clauses) - 1:
+                raise SchemeSyntaxError("else must be the last clause in cond.")
+
+            compile_body(body, scope, tail, instructions)
+            break
+
+        compile_s_expression(test, scope, False, instructions)
+
+        if not body:
+            # the value of the test is the value of the cond
+            emit(instructions, JUMP_IF_TRUE_OR_POP)
+            jumps_to_end.append(len(instructions) - 1)
+            continue
+
+        emit(instructions, JUMP_IF_FALSE)
+        jump_to_next_clause = len(instructions) - 1
+
+        compile_body(body, scope, tail, instructions)
+
+        if not tail:
+            emit(instructions, JUMP)
+            jumps_to_end.append(len(instructions) - 1)
+
+        instructions[jump_to_next_clause] = len(instructions)
+    else:
+        # no clause was true
+        emit(instructions, CONSTANT, None)
+        if tail:
+            emit(instructions, RETURN)
+
+    for jump in jumps_to_end:
+        instructions[jump] = len(instructions)
+
+    if tail and jumps_to_end:
+        emit(instructions, RETURN)
+
+
+def make_function(function_code, environment):
+    """Create a function object for function_code, closing over
+    environment. Other engines can call it like any function, and the
+    VM calls it directly without going through Python.
+
+    """
+    def compiled_function(arguments):
+        frame = bind_arguments(function_code, arguments, environment)
+        return run(function_code, frame)
+
+    if function_code.name is None:
+        function = LambdaFunction(compiled_function)
+    else:
+        function = UserFunction(compiled_function, function_code.name)
+
+    function.code = function_code
+    function.environment = environment
+
+    return function
+
+
+def bind_arguments(function_code, arguments, environment):
+    """Create the frame for a call to a compiled function."""
+    parameter_count = function_code.parameter_count
+
+    if function_code.is_variadic:
+        if len(arguments) < parameter_count:
+            check_argument_number(function_code.name, arguments, parameter_count)
+
+        values = arguments[:parameter_count]
+        values.append(Cons.from_list(arguments[parameter_count:]))
+    else:
+        if len(arguments) != parameter_count:
+            check_argument_number(function_code.name or '(anonymous function)',
+                                  arguments, parameter_count, parameter_count)
+
+        values = arguments
+
+    return Frame(values + function_code.local_definitions, environment)
+
+
+# the most calls that can be waiting for a callee to return
+MAXIMUM_DEPTH = 200000
+
+
+def run(code, frame):
+    """Execute code in frame, returning the value it produces.
+
+    Calls between compiled functions don't use the Python stack.
+    Instead, a call saves what the caller was doing (its code,
+    position, frame and stack) as a continuation, and returning
+    resumes the most recent continuation. This means deep recursion
+    is only limited by MAXIMUM_DEPTH.
+
+    """
+    instructions = code.instructions
+    stack = []
+    position = 0
+    continuations = []
+
+    while True:
+        opcode = instructions[position]
+        argument = instructions[position + 1]
+        position += 2
+
+        if opcode == LOAD_LOCAL:
+            value = frame.values[argument]
+
+            if value is UNASSIGNED:
+                raise undefined_variable(local_name(code, 0, argument), code.scope)
+
+            stack.append(value)
+
+        elif opcode == LOAD_GLOBAL:
+            value = argument.value
+
+            if value is UNASSIGNED:
+                if argument.name not in built_ins:
+                    raise undefined_variable(argument.name, code.scope)
+
+                value = BuiltInFunction(built_ins[argument.name], argument.name)
+
+            stack.append(value)
+
+        elif opcode == CONSTANT:
+            stack.append(argument)
+
+        elif opcode == CALL or opcode == TAIL_CALL:
+            if argument:
+                arguments = stack[-argument:]
+                del stack[-argument:]
+            else:
+                arguments = []
+
+            function = stack.pop()
+
+            if hasattr(function, 'code'):
+                new_frame = bind_arguments(function.code, arguments, function.environment)
+
+                # a tail call doesn't need a continuation, as the
+                # current function has nothing left to do
+                if opcode == CALL:
+                    if len(continuations) >= MAXIMUM_DEPTH:
+                        raise SchemeStackOverflow()
+
+                    continuations.append((code, position, frame, stack))
+
+                code = function.code
+                instructions = code.instructions
+                frame = new_frame
+                stack = []
+                position = 0
+                continue
+
+            if isinstance(function, Macro):
+                raise SchemeSyntaxError("Macro %s must be defined before code "
+                                        "that uses it." % function.name)
+
+            if not isinstance(function, Function):
+                raise SchemeTypeError("You can only call functions, but "
+                                      "you gave me a %s." % function.__class__)
+
+            result = call_function(function, arguments)
+
+            if opcode == TAIL_CALL:
+                if not continuations:
+                    return result
+
+                code, position, frame, stack = continuations.pop()
+                instructions = code.instructions
+
+            stack.append(result)
+
+        elif opcode == JUMP_IF_FALSE:
+            # everything except an explicit false boolean is true
+            condition = stack.pop()
+
+            if condition is FALSE:
+                position = argument
+
+        elif opcode == RETURN:
+            result = stack.pop()
+
+            if not continuations:
+                return result
+
+            code, position, frame, stack = continuations.pop()
+            instructions = code.instructions
+            stack.append(result)
+
+        elif opcode == JUMP:
+            position = argument
+
+        elif opcode == LOAD_PARENT_LOCAL:
+            depth, index = argument
+            environment = frame
+
+            for i in range(depth):
+                environment = environment.parent
+
+            value = environment.values[index]
+
+            if value is UNASSIGNED:
+                raise undefined_variable(local_name(code, depth, index), code.scope)
+
+            stack.append(value)
+
+        elif opcode == POP:
+            stack.pop()
+
+        elif opcode == JUMP_IF_FALSE_OR_POP:
+            condition = stack[-1]
+
+            if condition is FALSE:
+                position = argument
+            else:
+                stack.pop()
+
+        elif opcode == JUMP_IF_TRUE_OR_POP:
+            condition = stack[-1]
+
+            if condition is FALSE:
+                stack.pop()
+            else:
+                position = argument
+
+        elif opcode == ENTER or opcode == TAIL_ENTER:
+            # like calling a function, but the code is in the
+            # instruction and the new frame is inside the current one
+            count = argument.parameter_count
+
+            if count:
+                values = stack[-count:]
+                del stack[-count:]
+            else:
+                values = []
+
+            if opcode == ENTER:
+                if len(continuations) >= MAXIMUM_DEPTH:
+                    raise SchemeStackOverflow()
+
+                continuations.append((code, position, frame, stack))
+
+            frame = Frame(values + argument.local_definitions, frame)
+            code = argument
+            instructions = code.instructions
+            stack = []
+            position = 0
+
+        elif opcode == LOOP:
+            # the stack holds the new values of the variables, and each
+            # iteration gets a fresh frame so closures created in one
+            # iteration don't see later values
+            frame = Frame(stack + code.local_definitions, frame.parent)
+            stack = []
+            position = 0
+
+        elif opcode == MAKE_LOOP:
+            loop_frame = Frame([UNASSIGNED], frame)
+            loop_frame.values[0] = make_function(argument, loop_frame)
+            stack.append(loop_frame.values[0])
+
+        elif opcode == MAKE_FUNCTION:
+            stack.append(make_function(argument, frame))
+
+        elif opcode == EXECUTE:
+            stack.append(argument(frame))
+
+        elif opcode == SET_LOCAL:
+            depth, index = argument
+            environment = frame
+
+            for i in range(depth):
+                environment = environment.parent
+
+            if environment.values[index] is UNASSIGNED:
+                raise UndefinedVariable("Can't assign to undefined variable %s."
+                                        % local_name(code, depth, index))
+
+            environment.values[index] = stack.pop()
+            stack.append(None)
+
+        elif opcode == SET_GLOBAL:
+            if argument.value is UNASSIGNED:
+                raise UndefinedVariable("Can't assign to undefined variable %s." % argument.name)
+
+            argument.value = stack.pop()
+            stack.append(None)
+
+        elif opcode == DEFINE_LOCAL:
+            index, check_redefinition = argument
+
+            if check_redefinition and frame.values[index] is not UNASSIGNED:
+                raise RedefinedVariable("Cannot define %s, as it has already been defined."
+                                        % local_name(code, 0, index))
+
+            frame.values[index] = stack.pop()
+            stack.append(None)
+
+        elif opcode == DEFINE_GLOBAL:
+            cell, check_redefinition = argument
+
+            if check_redefinition and cell.value is not UNASSIGNED:
+                raise RedefinedVariable("Cannot define %s, as it has already been defined."
+                                        % cell.name)
+
+            cell.value = stack.pop()
+            stack.append(None)
+
+
+def local_name(code, depth, index):
+    """Find the name of a local variable, for error messages."""
+    scope = code.scope
+
+    for i in range(depth):
+        scope = scope.parent
+
+    return scope.names[index]
@@ -0,0 +1,172 @@
+"""Write the external representation of Scheme values to a file-like
+object as we go, without building the whole string first. We don't
+recurse, so deeply nested lists don't overflow the Python stack.
+
+Pairs and vectors that we can reach more than once are written with
+R7RS datum labels: #0= before the first occurrence and #0# for every
+later one. This means circular lists are written in finite space,
+e.g. #0=(1 2 . #0#).
+
+"""
+from data_types import Cons, Vector, NIL, get_external_representation
+
+
+def is_flat(value):
+    """Is value a list or vector that doesn't contain any lists or
+    vectors? A flat list can only reach a cell twice if its tail goes
+    round in a circle, which we check for as in Cons.find_end, so this
+    needs constant memory.
+
+    """
+    if isinstance(value, Vector):
+        for item in value:
+            if isinstance(item, (Cons, Vector)):
+                return False
+
+        return True
+
+    length = 0
+    element = value
+    slow = value
+
+    while isinstance(element, Cons):
+        if isinstance(element.head, (Cons, Vector)):
+            return False
+
+        length += 1
+        element = element.tail
+
+        if length % 2 == 0:
+            slow = slow.tail
+
+        if element is slow:
+            return False
+
+    return not isinstance(element, Vector)
+
+
+def find_shared(value):
+    """Return the ids of the pairs and vectors in value that we can
+    reach more than once.
+
+    """
+    # most large values are flat, so we avoid remembering every cell
+    if is_flat(value):
+        return set()
+
+    seen = set()
+    shared = set()
+    stack = [value]
+
+    while stack:
+        value = stack.pop()
+
+        # we follow tails in this loop, so a long list only takes one
+        # stack entry
+        while isinstance(value, (Cons, Vector)):
+            value_id = id(value)
+
+            if value_id in seen:
+                shared.add(value_id)
+                break
+
+            seen.add(value_id)
+
+            if isinstance(value, Vector):
+                stack.extend(value.value)
+                break
+
+            if isinstance(value.head, (Cons, Vector)):
+                stack.append(value.head)
+
+            value = value.tail
+
+    return shared
+
+
+class RestOfList(object):
+    """The part of a list we haven't written yet, starting at `tail`."""
+    __slots__ = ('tail',)
+
+    def __init__(self, tail):
+        self.tail = tail
+
+
+def write(value, output):
+    """Write the external representation of value to output."""
+    shared = find_shared(value)
+    labels = {}
+
+    # the stack holds values to write, RestOfLists, and strings to
+    # write verbatim (Scheme strings are String objects, so they can't
+    # be confused with these)
+    stack = [value]
+
+    while stack:
+        item = stack.pop()
+        item_type = type(item)
+
+        if item_type is str:
+            output.write(item)
+            continue
+
+        if item_type is RestOfList:
+            element = item.tail
+            separator = " "
+
+        elif item_type is Cons or item_type is Vector:
+            if shared and id(item) in shared:
+                if id(item) in labels:
+                    output.write("#%d#" % labels[id(item)])
+                    continue
+
+                labels[id(item)] = len(labels)
+                output.write("#%d=" % labels[id(item)])
+
+            if item_type is Vector:
+                output.write("#(")
+                stack.append(")")
+
+                for index in reversed(range(len(item))):
+                    stack.append(item[index])
+
+                    if index > 0:
+                        stack.append(" ")
+
+                continue
+
+            output.write("(")
+            element = item
+            separator = ""
+
+        else:
+            output.write(get_external_representation(item))
+            continue
+
+        # write elements until we reach the end of the list or a nested
+        # list or vector, which we come back to
+        while True:
+            if element is NIL:
+                output.write(")")
+                break
+
+            if type(element) is not Cons or \
+                    (separator and shared and id(element) in shared):
+                # an improper list, or a tail that needs a label
+                output.write(" . ")
+                stack.append(")")
+                stack.append(element)
+                break
+
+            head = element.head
+            head_type = type(head)
+
+            if head_type is Cons or head_type is Vector:
+                output.write(separator)
+                stack.append(RestOfList(element.tail))
+                stack.append(head)
+                break
+
+            output.write(separator + get_external_representation(head))
+            separator = " "
+            element = element.tail
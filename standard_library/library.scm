@@ -75,22 +75,6 @@
         (function (car list))
         (for-each function (cdr list)))))
 
-; scoping macros
-(defmacro let (assignments . body)
-  `((lambda ,(map car assignments) ,@body)
-    ,@(map cadr assignments)))
-
-(defmacro cond (clauses)
-  (let ((first-clause (car clauses)))
-    ; if we reach an else statment we evaluate it unconditionally
-    (if (eqv? (car first-clause) 'else)
-        (cadr first-clause)
-        ; if this condition is true, evaluate the body of that condition
-        `(if ,(car first-clause)
-             ,(cadr first-clause)
-             ; otherwise recurse on the rest of the clauses
-             (cond ,(cdr clauses))))))
-
 ; vector functions
 (define (vector . args)
   (let ((v (make-vector (length args)))
@@ -103,16 +87,10 @@
     v))
 
 (define (vector->list vector)
-  ;; vector-list-iter is a recursive helper function that moves
-  ;; through the vector and builds a list.
-  (let ((vector->list-iter
-         (lambda (index)
-           (if (>= index (vector-length vector))
-               '()
-               (cons
-                (vector-ref vector index)
-                (vector->list-iter (+ index 1)))))))
-    (vector->list-iter 0)))
+  ;; build the list backwards, so we only need to cons onto the front
+  (do ((index (- (vector-length vector) 1) (- index 1))
+       (list '() (cons (vector-ref vector index) list)))
+      ((< index 0) list)))
 
 (define (list->vector list)
   (let ((v (make-vector (length list)))
@@ -125,27 +103,15 @@
     v))
 
 (define (vector-fill! vector fill)
-  (let ((vector-fill-iter
-         (lambda (index)
-           (if (>= index (vector-length vector))
-               '()
-               (begin
-                 (vector-set! vector index fill)
-                 (vector-fill-iter (+ index 1)))))))
-    (vector-fill-iter 0)))
+  (do ((index 0 (+ index 1)))
+      ((>= index (vector-length vector)))
+    (vector-set! vector index fill)))
 
 ; I/O
 (define (newline)
   (display "\n"))
 
 ; booleans
-; note that R5RS requires 'and and 'or to take a variable number of arguments
-(defmacro and (x y)
-  `(if ,x (if ,y ,y #f) #f))
-
-(defmacro or (x y)
-  `(if ,x ,x ,y))
-
 (define (not x)
   (eqv? x #f))
 